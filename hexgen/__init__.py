@@ -4,7 +4,7 @@ from hexgen.mapgen import MapGen
 from hexgen.hex import HexFeature
 from hexgen.constants import *
 from hexgen.enums import GeoformType
-from hexgen.draw import HexGridDraw
+from hexgen.draw import MapDraw, Layer
 
 # @exec_time
 def draw_grid(hex_grid):
@@ -104,24 +104,26 @@ def draw_grid(hex_grid):
                 return g.color
         return (0, 0, 255)
 
-    HexGridDraw(hex_grid, color_features, "../output/map_features.png", show_coasts=True, rivers=False)
-    HexGridDraw(hex_grid, color_heightmap, "../output/map_height.png",   rivers=False, show_coasts=True)
-    HexGridDraw(hex_grid, color_terrain, "../output/map_terrain.png",    rivers=True, show_coasts=True)
-    HexGridDraw(hex_grid, color_hex_type, "../output/map_hex_types.png", rivers=True, show_coasts=True)
-    HexGridDraw(hex_grid, color_geoforms, "../output/map_geoforms.png", rivers=False, show_coasts=True)
-    HexGridDraw(hex_grid, color_rivers, "../output/map_rivers.png", rivers=True, show_coasts=True)
-    HexGridDraw(hex_grid, color_temperature_end_year, "../output/map_temp_end_year.png", rivers=False, show_coasts=True)
-    HexGridDraw(hex_grid, color_temperature_mid_year, "../output/map_temp_mid_year.png", rivers=False, show_coasts=True)
-    HexGridDraw(hex_grid, color_biome, "../output/map_biome.png", rivers=False)
-    HexGridDraw(hex_grid, color_territories, "../output/map_territories.png", rivers=False, show_coasts=True, borders=True)
-    HexGridDraw(hex_grid, color_satellite, "../output/map_satellite.png")
-    HexGridDraw(hex_grid, color_resources, "../output/map_resources.png")
-    HexGridDraw(hex_grid, color_zone, "../output/map_zone.png", text_func=key_zone, rivers=False, show_coasts=False)
-    HexGridDraw(hex_grid, color_zone, "../output/map_latitude.png", text_func=hex_latitude, rivers=False, show_coasts=False)
-    HexGridDraw(hex_grid, color_pressure_end_year, "../output/map_pressure_end_year.png", rivers=False, show_coasts=True)
-    HexGridDraw(hex_grid, color_pressure_mid_year, "../output/map_pressure_mid_year.png", rivers=False, show_coasts=True)
-    HexGridDraw(hex_grid, color_wind_end_year, "../output/map_wind_end_year.png", text_func=wind_display_end_year, rivers=False, show_coasts=True)
-    HexGridDraw(hex_grid, color_wind_mid_year, "../output/map_wind_mid_year.png", text_func=wind_display_mid_year, rivers=False, show_coasts=True)
+    MapDraw(hex_grid, [
+        Layer(color_features, "../output/map_features.png", show_coasts=True, rivers=False),
+        Layer(color_heightmap, "../output/map_height.png",   rivers=False, show_coasts=True),
+        Layer(color_terrain, "../output/map_terrain.png",    rivers=True, show_coasts=True),
+        Layer(color_hex_type, "../output/map_hex_types.png", rivers=True, show_coasts=True),
+        Layer(color_geoforms, "../output/map_geoforms.png", rivers=False, show_coasts=True),
+        Layer(color_rivers, "../output/map_rivers.png", rivers=True, show_coasts=True),
+        Layer(color_temperature_end_year, "../output/map_temp_end_year.png", rivers=False, show_coasts=True),
+        Layer(color_temperature_mid_year, "../output/map_temp_mid_year.png", rivers=False, show_coasts=True),
+        Layer(color_biome, "../output/map_biome.png", rivers=False),
+        Layer(color_territories, "../output/map_territories.png", rivers=False, show_coasts=True, borders=True),
+        Layer(color_satellite, "../output/map_satellite.png"),
+        Layer(color_resources, "../output/map_resources.png"),
+        Layer(color_zone, "../output/map_zone.png", text_func=key_zone, rivers=False, show_coasts=False),
+        Layer(color_zone, "../output/map_latitude.png", text_func=hex_latitude, rivers=False, show_coasts=False),
+        Layer(color_pressure_end_year, "../output/map_pressure_end_year.png", rivers=False, show_coasts=True),
+        Layer(color_pressure_mid_year, "../output/map_pressure_mid_year.png", rivers=False, show_coasts=True),
+        Layer(color_wind_end_year, "../output/map_wind_end_year.png", text_func=wind_display_end_year, rivers=False, show_coasts=True),
+        Layer(color_wind_mid_year, "../output/map_wind_mid_year.png", text_func=wind_display_mid_year, rivers=False, show_coasts=True)
+    ], engine=hex_grid.params.get('draw_engine'), workers=hex_grid.params.get('draw_workers'))
 
     # report on territories
     for t in hex_grid.territories:
@@ -0,0 +1,132 @@
+import numpy as np
+
+from hexgen.enums import Biome, MapType, HexFeature
+from hexgen.hex import BIOMES, FEATURE_BITS
+
+# id of each Biome in biome id arrays, its place in Biome.list()
+BIOME_IDS = dict((biome, i) for i, biome in enumerate(BIOMES))
+
+# every temperature and rainfall the terran rules compare against
+TERRAN_TEMPERATURES = (-10, 0, 7, 20)
+TERRAN_RAINFALL = (0, 3.5, 4, 5, 8, 10, 20)
+
+
+def terran_biome(temp, rain):
+    """
+    Biome of a terran hex
+    :param temp: temperature at the end of the year
+    :param rain: moisture
+    :return: Biome
+    """
+    if temp <= -10:
+        return Biome.arctic
+    elif 5 < rain and temp <= 0:
+        return Biome.alpine_tundra
+    elif 0 <= rain <= 5 and temp <= 0:
+        return Biome.tundra
+    elif 5 < rain and 0 < temp <= 7:
+        return Biome.boreal_forest
+    elif 0 <= rain <= 3.5 and 0 < temp <= 20:
+        return Biome.grasslands
+    elif 3.5 < rain <= 5 and 0 < temp <= 20:
+        return Biome.shrubland
+    elif 0 <= rain < 4 and 20 < temp:
+        return Biome.desert
+    elif 4 <= rain <= 8 and 20 < temp:
+        return Biome.shrubland
+    elif 5 < rain <= 10 and 7 < temp <= 20:
+        return Biome.savanna
+    elif 10 < rain <= 20 and 7 < temp <= 20:
+        return Biome.temperate_forest
+    elif 20 < rain and 7 < temp <= 20:
+        return Biome.temperate_rainforest
+    elif 8 < rain <= 20 and 20 < temp:
+        return Biome.tropical_forest
+    elif 20 < rain and 20 < temp:
+        return Biome.tropical_rainforest
+
+    raise Exception("Biome invalid Rainfall: {}, Temperature: {}".format(rain, temp))
+
+
+def _cells(values, breaks):
+    """
+    Which cell of the breakpoints each value falls in. Below the first break is cell 0,
+    each break is a cell of its own and the ranges between them are the cells in between
+    """
+    breaks = np.asarray(breaks, dtype=np.float64)
+    index = np.searchsorted(breaks, values)
+    exact = breaks[np.minimum(index, len(breaks) - 1)] == values
+    return 2 * index + exact
+
+
+def _representatives(breaks):
+    """ A value in each cell of the breakpoints """
+    values = [breaks[0] - 1]
+    for low, high in zip(breaks, breaks[1:]):
+        values.extend([low, (low + high) / 2])
+    values.extend([breaks[-1], breaks[-1] + 1])
+    return values
+
+
+class BiomeTable:
+    """
+    A rule on two values compiled into a lookup table. The rule must only compare its
+    values against the given breakpoints, so it gives the same biome everywhere in a cell
+    """
+
+    def __init__(self, rule, first_breaks, second_breaks):
+        self.rule = rule
+        self.first_breaks = first_breaks
+        self.second_breaks = second_breaks
+        firsts = _representatives(first_breaks)
+        seconds = _representatives(second_breaks)
+        self.table = np.full((len(firsts), len(seconds)), -1, dtype=np.int8)
+        for i, first in enumerate(firsts):
+            for j, second in enumerate(seconds):
+                try:
+                    self.table[i, j] = BIOME_IDS[rule(first, second)]
+                except Exception:
+                    pass  # no biome, raised again if a hex lands here
+
+    def classify(self, first, second):
+        """
+        Biome ids for arrays of values
+        :return: int8 array the shape of the values
+        """
+        result = self.table[_cells(first, self.first_breaks), _cells(second, self.second_breaks)]
+        if (result < 0).any():
+            bad = np.argmax(result.ravel() < 0)
+            self.rule(np.ravel(first)[bad], np.ravel(second)[bad])
+        return result
+
+
+TERRAN_TABLE = BiomeTable(terran_biome, TERRAN_TEMPERATURES, TERRAN_RAINFALL)
+
+
+def classify_biomes(grid):
+    """
+    Biome of every hex of a grid
+    :return: int8 array of shape (size, size) of ids into BIOMES
+    """
+    map_type = grid.params.get('map_type')
+    shape = (grid.size, grid.size)
+    if map_type is MapType.terran:
+        return TERRAN_TABLE.classify(grid.temperature[:, :, 0], grid.moisture)
+
+    elif map_type is MapType.barren:
+        if grid.params.get('pressure') < 0.003: # trace atmosphere
+            return np.full(shape, BIOME_IDS[Biome.barren], dtype=np.int8)
+        # TODO: determine where to put ice caps based on atmospheric compounds
+        ice_caps = grid.coldest & (grid.temperature[:, :, 0] < 0)
+        wet = (grid.moisture > 5) | (grid.features & FEATURE_BITS[HexFeature.lake] > 0)
+        return np.select([ice_caps, wet],
+                         [BIOME_IDS[Biome.barren_ice_caps], BIOME_IDS[Biome.barren_wet]],
+                         BIOME_IDS[Biome.barren_dusty]).astype(np.int8)
+
+    elif map_type is MapType.volcanic:
+        lava_flow = grid.features & FEATURE_BITS[HexFeature.lava_flow] > 0
+        return np.select([grid.altitude < 60, lava_flow],
+                         [BIOME_IDS[Biome.volcanic_liquid], BIOME_IDS[Biome.volcanic_molten_river]],
+                         BIOME_IDS[Biome.volcanic_solid]).astype(np.int8)
+
+    return np.full(shape, BIOME_IDS[Biome.lifeless], dtype=np.int8)
@@ -1,128 +1,482 @@
-from hexgen.hex import HexSide
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 from PIL import Image, ImageDraw, ImageFont
-from hexgen.constants import SIDE_LENGTH, HEX_HEIGHT, HEX_RADIUS, HEX_RECT_HEIGHT, HEX_RECT_WIDTH
-from hexgen.util import Timer
+from hexgen.constants import SIDE_LENGTH, HEX_HEIGHT, HEX_RADIUS, HEX_RECT_HEIGHT, HEX_RECT_WIDTH, HEXAGON_ANGLE
+from hexgen.edge import SIDE_COLUMNS
+from hexgen.util import Timer, memoized
 
-class HexGridDraw:
+RIVER_COLOR = (200, 200, 200)
+
+# corners of a hexagon, clockwise from the top, as offsets from the top left of its rectangle
+CORNERS = [(HEX_RADIUS, 0), (HEX_RECT_WIDTH, HEX_HEIGHT), (HEX_RECT_WIDTH, HEX_HEIGHT + SIDE_LENGTH),
+           (HEX_RADIUS, HEX_RECT_HEIGHT), (0, SIDE_LENGTH + HEX_HEIGHT), (0, HEX_HEIGHT)]
+
+# the two corners at the ends of each side column
+SIDE_CORNERS = [(1, 2), (0, 1), (5, 0), (4, 5), (3, 4), (2, 3)]
+
+
+# where hex_raster keeps the rasters it has made
+RASTER_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'hexgen')
+
+# raster distances are kept in sixteenths of a pixel
+DISTANCE_SCALE = 16
+
+
+def image_size(size):
+    """ Width and height of the image of a map """
+    return int(HEX_RECT_WIDTH * (size + 0.6)), int(HEX_RECT_WIDTH * size)
+
+
+def _rasterize(size):
+    width, height = image_size(size)
+    index = np.full((height, width), -1, dtype=np.int32)
+    side = np.zeros((height, width), dtype=np.int8)
+    distance = np.zeros((height, width), dtype=np.uint8)
+    row_height = SIDE_LENGTH + HEX_HEIGHT
+    px = np.arange(width) + 0.5
+    band = max(1, 2 ** 20 // width)
+    for top in range(0, height, band):
+        py = np.arange(top, min(top + band, height))[:, np.newaxis] + 0.5
+        found = index[top:top + band]
+        row = np.floor(py / row_height).astype(int)
+        # a pixel is in the hexagon of the row it starts in, or in the bottom of the row above
+        for x in (row, row - 1):
+            left = (x % 2) * HEX_RADIUS
+            y = np.floor((px - left) / HEX_RECT_WIDTH).astype(int)
+            u = px - left - y * HEX_RECT_WIDTH
+            v = py - x * row_height
+            slope = HEX_HEIGHT * np.abs(u - HEX_RADIUS) / HEX_RADIUS
+            inside = (found < 0) & (x >= 0) & (x < size) & (y >= 0) & (y < size) & \
+                     (slope <= v) & (v <= HEX_RECT_HEIGHT - slope)
+
+            # distance to each side in side column order
+            du, dv = u - HEX_RADIUS, v - HEX_RECT_HEIGHT
+            sides = np.stack(np.broadcast_arrays(
+                HEX_RECT_WIDTH - u,
+                (v * HEX_RADIUS - du * HEX_HEIGHT) / SIDE_LENGTH,
+                (v * HEX_RADIUS + du * HEX_HEIGHT) / SIDE_LENGTH,
+                u,
+                (du * HEX_HEIGHT - dv * HEX_RADIUS) / SIDE_LENGTH,
+                (-du * HEX_HEIGHT - dv * HEX_RADIUS) / SIDE_LENGTH))
+            nearest = np.argmin(sides, axis=0)
+            nearest_distance = np.take_along_axis(sides, nearest[np.newaxis], axis=0)[0]
+
+            found[inside] = (x * size + y)[inside]
+            side[top:top + band][inside] = nearest[inside]
+            distance[top:top + band][inside] = np.clip(nearest_distance[inside] * DISTANCE_SCALE, 0, 255)
+    return index, side, distance
+
+
+def hex_raster(size, cache_dir=RASTER_CACHE_DIR):
     """
-    Draws a hexagon grid to an image. For debugging and development purposes
+    Which hex every pixel of the image of a map is in, and how far it is from the nearest
+    side of that hex. Made once for each map size and hex shape, then kept as .npy files
+    :param size: map size
+    :param cache_dir: directory the rasters are kept in, None to not keep them
+    :return: (index, side, distance) arrays with the image's height and width: flat hex index,
+             -1 outside every hex, side column of the nearest side and distance to it in
+             sixteenths of a pixel
     """
+    names = ('index', 'side', 'distance')
+    key = "raster_{}_{}_{:.6f}".format(size, SIDE_LENGTH, HEXAGON_ANGLE)
+    if cache_dir is not None:
+        paths = [os.path.join(cache_dir, "{}_{}.npy".format(key, name)) for name in names]
+        if all(os.path.exists(path) for path in paths):
+            return tuple(np.load(path, mmap_mode='r') for path in paths)
 
-    def __init__(self, grid, color_func, file_name, rivers=True,
-                 numbers=False, show_coasts=False, borders=False, text_func=None):
-        self.image = Image.new("RGB", (int(HEX_RECT_WIDTH * (grid.hex_grid.size + 0.6)),
-                                       int((HEX_RECT_WIDTH) * grid.hex_grid.size)))
-        self.draw = ImageDraw.Draw(self.image)
-        self.Grid = grid
-        self.color_func = color_func
-        self.text_func = text_func
+    arrays = _rasterize(size)
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        for path, array in zip(paths, arrays):
+            temporary = path + ".tmp.npy"
+            np.save(temporary, array)
+            os.replace(temporary, path)
+    return arrays
+
+
+def _pack(colors):
+    """ Packs (n, 3) colors into n little endian RGBX words, so a pixel is one array item """
+    colors = np.asarray(colors, dtype=np.uint32)
+    return (colors[:, 0] | colors[:, 1] << 8 | colors[:, 2] << 16).astype('<u4')
+
+
+# labels from text functions are drawn in this font, numbers in PIL's default font
+FONT_NAME = "FreeSans.ttf"
+FONT_SIZE = 14
+TEXT_COLOR = (200, 200, 200)
+
+
+@memoized
+def get_font(name=None, size=FONT_SIZE):
+    """
+    A font, loaded once per process. A font file that can't be loaded raises OSError each
+    time it is asked for
+    :param name: font file, None for PIL's default font
+    :return: the font
+    """
+    if name is None:
+        return ImageFont.load_default()
+    return ImageFont.truetype(name, size)
 
+
+@memoized
+def label_stamp(text, name=None, size=FONT_SIZE):
+    """
+    A label drawn once as a mask, then pasted wherever it appears
+    :param name: font file, None for PIL's default font
+    :return: (mask, values, (left, top)) the mask as an image and as an array, and where
+             it goes from the text position
+    """
+    font = get_font(name, size)
+    left, top, right, bottom = ImageDraw.Draw(Image.new("L", (1, 1))).textbbox((0, 0), text, font=font)
+    mask = Image.new("L", (max(right - left, 1), max(bottom - top, 1)))
+    ImageDraw.Draw(mask).text((-left, -top), text, fill=255, font=font)
+    return mask, np.asarray(mask), (left, top)
+
+
+def hexagon_corners(x, y):
+    """ Corners of the hexagon of a hex in image coordinates """
+    cx = y * HEX_RECT_WIDTH + ((x % 2) * HEX_RADIUS)
+    cy = x * (SIDE_LENGTH + HEX_HEIGHT)
+    return [(cx + dx, cy + dy) for dx, dy in CORNERS]
+
+
+class Layer:
+    """ One image of a hexagon grid, its hex colors and the overlays drawn on top """
+
+    def __init__(self, color_func, file_name, rivers=True, numbers=False, show_coasts=False,
+                 borders=False, text_func=None):
+        self.color_func = color_func
+        self.file_name = file_name
+        self.rivers = rivers
         self.numbers = numbers
         self.show_coasts = show_coasts
         self.borders = borders
+        self.text_func = text_func
+
+
+class MapSnapshot:
+    """
+    Everything drawing a set of layers needs to know about each hex, taken in one walk over
+    the grid: hex colors and labels of every layer, and the sides with coasts, borders and
+    rivers. Holds only numpy arrays and strings, so it can be sent to other processes
+    """
+
+    def __init__(self, grid, layers):
+        hex_grid = grid.hex_grid
+        size = hex_grid.size
+        self.size = size
+        # the layers without their functions
+        self.layers = [Layer(None, layer.file_name, rivers=layer.rivers, numbers=layer.numbers,
+                             show_coasts=layer.show_coasts, borders=layer.borders) for layer in layers]
+        self.edge_keys = hex_grid.edge_keys
+        self.coasts, self.borders = self.overlay_sides(grid)
+
+        # river segments are kept at the side of the hex they belong to
+        self.rivers = np.zeros((size * size, 6), dtype=bool)
+        if any(layer.rivers for layer in layers):
+            for index, sides in grid.river_index.sides.items():
+                self.rivers[index, [SIDE_COLUMNS[s] for s in sides]] = True
+
+        colors = [np.zeros((size * size, 3), dtype=np.int64) for _ in layers]
+        self.texts = [[None] * (size * size) if layer.text_func else None for layer in layers]
+        self.numbers = [None] * (size * size) if any(layer.numbers for layer in layers) else None
+        for x in range(size):
+            for y in range(size):
+                h = hex_grid.find_hex(x, y)
+                index = x * size + y
+                for layer, color, texts in zip(layers, colors, self.texts):
+                    color[index] = layer.color_func(h)[:3]
+                    if texts is not None:
+                        texts[index] = str(layer.text_func(h))
+                if self.numbers is not None:
+                    self.numbers[index] = (str(h.altitude), str(h.x), str(h.y), str(h.moisture), str(h.temperature))
+        self.colors = [np.clip(color, 0, 255).astype(np.uint8) for color in colors]
+        self._raster_lines = None
+
+    def overlay_sides(self, grid):
+        """
+        Sides of every hex to draw coasts and borders on
+        :return: (coasts, borders) bool arrays of shape (size * size, 6) in side column order
+        """
+        hex_grid = grid.hex_grid
+        table = hex_grid.neighbor_table
+        land = hex_grid.land.ravel()
+        coasts = land[:, np.newaxis] & ~land[table]
+        if not grid.params.get('hydrosphere'):
+            coasts[:] = False
+        territory_id = hex_grid.territory_id.ravel()
+        owned = territory_id >= 0
+        borders = owned[:, np.newaxis] & owned[table] & (territory_id[:, np.newaxis] != territory_id[table])
+        return coasts, borders
+
+    def raster_lines(self, raster):
+        """
+        Pixels of the outlines, coasts, borders and rivers, found once and kept for every layer
+        :param raster: (index, side, distance) arrays from hex_raster
+        :return: dict of flat pixel arrays: outlines, coasts, borders and rivers
+        """
+        if self._raster_lines is None:
+            index, side, distance = raster
+            # only pixels this close to a side of their hex can be on a line
+            widest = 4
+            near = np.flatnonzero((index >= 0) & (distance < widest * DISTANCE_SCALE / 2))
+            near_hex, near_side, near_distance = index.flat[near], side.flat[near], distance.flat[near]
+
+            def line(mask, width):
+                # pixels within half the line width of a side, from the hexes on both sides
+                return near[(near_distance < width * DISTANCE_SCALE / 2) & mask[near_hex, near_side]]
+
+            rivers = np.isin(self.edge_keys, self.edge_keys[self.rivers])
+            self._raster_lines = dict(outlines=line(np.ones(self.coasts.shape, dtype=bool), 1),
+                                      coasts=line(self.coasts, 4),
+                                      borders=line(self.borders, 2),
+                                      rivers=line(rivers, 3))
+        return self._raster_lines
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['_raster_lines'] = None
+        return state
+
+
+# layer flag, snapshot sides, line color and width of each overlay, in the order they are drawn
+OVERLAYS = [('show_coasts', 'coasts', (0, 0, 0), 4),
+            ('borders', 'borders', (0, 0, 0), 2),
+            ('rivers', 'rivers', RIVER_COLOR, 3)]
+
 
-        with Timer("Making {}".format(file_name), True):
-            for y in range(grid.hex_grid.size):
-                for x in range(grid.hex_grid.size):
-                    h = grid.hex_grid.find_hex(x, y)
-                    self.draw_hexagon(y * HEX_RECT_WIDTH + ((x % 2) * HEX_RADIUS),
-                                      x * (SIDE_LENGTH + HEX_HEIGHT), x, y)
-
-                    if self.show_coasts and grid.params.get('hydrosphere'):
-                        for e in h.edges:
-                            if h.is_land and e.two.is_water:
-                                self.draw_hex_edge(x, y, e.side, 4)
-                    if self.borders:
-                        for e in h.edges:
-                            if e.one.is_owned and e.two.is_owned and \
-                                            e.one.territory.id != e.two.territory.id:
-                                self.draw_hex_edge(x, y, e.side, 2)
-                    if rivers:
-                        cx = y * HEX_RECT_WIDTH + ( (x % 2) * HEX_RADIUS)
-                        cy = x * (SIDE_LENGTH + HEX_HEIGHT)
-                        origin = (cx + HEX_RADIUS, cy)
-                        pointer = (cx + HEX_RECT_WIDTH, cy + HEX_HEIGHT)
-                        pointer_2 = (cx + HEX_RECT_WIDTH, cy + HEX_HEIGHT + SIDE_LENGTH)
-                        pointer_3 = (cx + HEX_RADIUS, cy + HEX_RECT_HEIGHT)
-                        pointer_4 = (cx, cy + SIDE_LENGTH + HEX_HEIGHT)
-                        pointer_5 = (cx, cy + HEX_HEIGHT)
-                        segments = self.Grid.find_river(x, y)
-                        river_blue = (200, 200, 200)  # (255, 255, 255)
-                        for s in segments:
-                            # print("RiverSegment {} at {}, {}".format(s, x, y))
-                            if s is HexSide.north_east:
-                                self.draw.line([origin, pointer], river_blue, width=3)
-                            elif s is HexSide.east:
-                                self.draw.line([pointer, pointer_2], river_blue, width=3)
-                            elif s is HexSide.south_east:
-                                self.draw.line([pointer_2, pointer_3], river_blue, width=3)
-                            elif s is HexSide.south_west:
-                                self.draw.line([pointer_3, pointer_4], river_blue, width=3)
-                            elif s is HexSide.west:
-                                self.draw.line([pointer_4, pointer_5], river_blue, width=3)
-                            elif s is HexSide.north_west:
-                                self.draw.line([pointer_5, origin], river_blue, width=3)
-            self.image.save('bin/' + file_name)
-
-    def draw_hex_edge(self, x, y, side, width=3, color=(0, 0, 0)):
-        s = side
-        cx = y * HEX_RECT_WIDTH + ( (x % 2) * HEX_RADIUS)
-        cy = x * (SIDE_LENGTH + HEX_HEIGHT)
-        origin = (cx + HEX_RADIUS, cy)
-        pointer = (cx + HEX_RECT_WIDTH, cy + HEX_HEIGHT)
-        pointer_2 = (cx + HEX_RECT_WIDTH, cy + HEX_HEIGHT + SIDE_LENGTH)
-        pointer_3 = (cx + HEX_RADIUS, cy + HEX_RECT_HEIGHT)
-        pointer_4 = (cx, cy + SIDE_LENGTH + HEX_HEIGHT)
-        pointer_5 = (cx, cy + HEX_HEIGHT)
-        if s is HexSide.north_east:
-            self.draw.line([origin, pointer], color, width=width)
-        elif s is HexSide.east:
-            self.draw.line([pointer, pointer_2], color, width=width)
-        elif s is HexSide.south_east:
-            self.draw.line([pointer_2, pointer_3], color, width=width)
-        elif s is HexSide.south_west:
-            self.draw.line([pointer_3, pointer_4], color, width=width)
-        elif s is HexSide.west:
-            self.draw.line([pointer_4, pointer_5], color, width=width)
-        elif s is HexSide.north_west:
-            self.draw.line([pointer_5, origin], color, width=width)
-
-    def make_line(self, from_coord, to_coord):
-        self.draw.line([from_coord, to_coord], (0, 0, 0))
-
-
-    def draw_hexagon(self, cx, cy, x, y):
-        origin = (cx + HEX_RADIUS, cy)
-        pointer = (cx + HEX_RECT_WIDTH, cy + HEX_HEIGHT)
-        pointer_2 = (cx + HEX_RECT_WIDTH, cy + HEX_HEIGHT + SIDE_LENGTH)
-        pointer_3 = (cx + HEX_RADIUS, cy + HEX_RECT_HEIGHT)
-        pointer_4 = (cx, cy + SIDE_LENGTH + HEX_HEIGHT)
-        pointer_5 = (cx, cy + HEX_HEIGHT)
-
-        h = self.Grid.hex_grid.find_hex(x, y)
-        self.draw.polygon([origin,
-                           pointer,
-                           pointer_2,
-                           pointer_3,
-                           pointer_4,
-                           pointer_5],
-                          outline=None,
-                          fill=self.color_func(h))
-
-        self.make_line(origin, pointer)
-        self.make_line(pointer, pointer_2)
-        self.make_line(pointer_2, pointer_3)
-        self.make_line(pointer_3, pointer_4)
-        self.make_line(pointer_4, pointer_5)
-        self.make_line(pointer_5, origin)
-
-        if self.numbers:
-            self.draw.text((cx + 10, cy + 3), str(h.altitude), fill=(200, 200, 200))
-            self.draw.text((cx + 4, cy + 11), str(x), fill=(200, 200, 200))
-            self.draw.text((cx + 4, cy + 19), str(y), fill=(200, 200, 200))
-            self.draw.text((cx + 18, cy + 11), str(h.moisture), fill=(200, 200, 200))
-            self.draw.text((cx + 18, cy + 19), str(h.temperature), fill=(200, 200, 200))
-
-        if self.text_func:
-            font = ImageFont.truetype("FreeSans.ttf", 14)
-            self.draw.text((cx + 5, cy + 5), str(self.text_func(h)), fill=(200, 200, 200), font=font)
+def draw_hex_edge(draw, corners, side, width=3, color=(0, 0, 0)):
+    """ Draws a line along a side of a hexagon, given its side column """
+    one, two = SIDE_CORNERS[side]
+    draw.line([corners[one], corners[two]], color, width=width)
+
+
+def hex_labels(snapshot, number, corners, index):
+    """
+    The labels of a layer on a hex, put together into one mask. Labels start on the
+    pixel nearest their text position
+    :return: (mask, values, (left, top)) as label_stamp, with the pixel of the mask's top left
+             corner, or None for a hex without labels
+    """
+    cx, cy = corners[5][0], corners[0][1]
+    labels = []
+    if snapshot.layers[number].numbers:
+        altitude, x, y, moisture, temperature = snapshot.numbers[index]
+        labels += [((cx + 10, cy + 3), altitude, None), ((cx + 4, cy + 11), x, None), ((cx + 4, cy + 19), y, None),
+                   ((cx + 18, cy + 11), moisture, None), ((cx + 18, cy + 19), temperature, None)]
+    texts = snapshot.texts[number]
+    if texts is not None:
+        labels.append(((cx + 5, cy + 5), texts[index], FONT_NAME))
+    if not labels:
+        return None
+
+    stamps = []
+    for (x, y), text, name in labels:
+        mask, values, (left, top) = label_stamp(text, name)
+        stamps.append((mask, values, round(x) + left, round(y) + top))
+    if len(stamps) == 1:
+        mask, values, left, top = stamps[0]
+        return mask, values, (left, top)
+
+    # labels are drawn over each other with PIL's blend, as when drawn one by one
+    left = min(stamp_left for _, _, stamp_left, _ in stamps)
+    top = min(stamp_top for _, _, _, stamp_top in stamps)
+    right = max(stamp_left + values.shape[1] for _, values, stamp_left, _ in stamps)
+    bottom = max(stamp_top + values.shape[0] for _, values, _, stamp_top in stamps)
+    canvas = np.zeros((bottom - top, right - left), dtype=np.uint8)
+    for _, values, stamp_left, stamp_top in stamps:
+        area = canvas[stamp_top - top:stamp_top - top + values.shape[0],
+                      stamp_left - left:stamp_left - left + values.shape[1]]
+        blend = (255 - area.astype(np.int32)) * values + 128
+        area += (((blend >> 8) + blend) >> 8).astype(np.uint8)
+    return Image.fromarray(canvas, "L"), canvas, (left, top)
+
+
+def _has_text(snapshot, number):
+    return snapshot.layers[number].numbers or snapshot.texts[number] is not None
+
+
+def draw_vector(snapshot, number):
+    """ Draws a layer of a snapshot one hexagon at a time with PIL """
+    layer = snapshot.layers[number]
+    colors = snapshot.colors[number]
+    size = snapshot.size
+    image = Image.new("RGB", image_size(size))
+    draw = ImageDraw.Draw(image)
+    overlays = [(getattr(snapshot, sides), color, width) for flag, sides, color, width in OVERLAYS
+                if getattr(layer, flag)]
+
+    for y in range(size):
+        for x in range(size):
+            index = x * size + y
+            corners = hexagon_corners(x, y)
+            draw.polygon(corners, outline=None, fill=tuple(int(c) for c in colors[index]))
+            for i in range(6):
+                draw.line([corners[i], corners[(i + 1) % 6]], (0, 0, 0))
+            labels = hex_labels(snapshot, number, corners, index) if _has_text(snapshot, number) else None
+            if labels is not None:
+                mask, _, position = labels
+                image.paste(TEXT_COLOR, position, mask)
+            for sides, color, width in overlays:
+                for side in np.flatnonzero(sides[index]):
+                    draw_hex_edge(draw, corners, side, width, color)
+    return image
+
+
+def draw_ranks(index, size):
+    """
+    When the vector engine draws the hex of each pixel: hexes are drawn a row at a time
+    :param index: pixel to hex index array from hex_raster
+    :return: int32 array shaped like index, -1 where no hex is drawn
+    """
+    hexes = np.arange(size * size)
+    ranks = np.append((hexes % size) * size + hexes // size, -1).astype(np.int32)
+    return ranks[index]
+
+
+def draw_raster(snapshot, number, raster):
+    """
+    Draws a layer of a snapshot by indexing its hex colors with a pixel to hex raster.
+    Lines are the pixels close enough to a side of their hex. Labels are pasted in the order
+    the vector engine draws them, so hexes drawn later cover them as they would there
+    :param raster: (index, side, distance) arrays from hex_raster
+    """
+    layer = snapshot.layers[number]
+    index = raster[0]
+    lines = snapshot.raster_lines(raster)
+    overlays = [(lines[sides], _pack(np.array([color]))[0]) for flag, sides, color, _ in OVERLAYS
+                if getattr(layer, flag)]
+
+    # the palette's last color is the background, indexed by -1
+    palette = _pack(np.vstack([snapshot.colors[number], np.zeros((1, 3), dtype=np.uint8)]))
+    pixels = palette[index]
+    flat = pixels.reshape(-1)
+    flat[lines['outlines']] = 0
+    if not _has_text(snapshot, number):
+        for line, color in overlays:
+            flat[line] = color
+        return Image.frombytes("RGB", (index.shape[1], index.shape[0]), pixels.tobytes(), "raw", "RGBX")
+
+    image = Image.frombytes("RGB", (index.shape[1], index.shape[0]), pixels.tobytes(), "raw", "RGBX")
+    size = snapshot.size
+    ranks = draw_ranks(index, size)
+    # which hex's label each pixel shows, -1 for none
+    text_ranks = np.full(index.shape, -1, dtype=np.int32)
+    for y in range(size):
+        for x in range(size):
+            labels = hex_labels(snapshot, number, hexagon_corners(x, y), x * size + y)
+            if labels is None:
+                continue
+            # only where no hex drawn after this one covers the labels
+            mask, values, (left, top) = labels
+            rows = slice(max(top, 0), min(top + values.shape[0], index.shape[0]))
+            columns = slice(max(left, 0), min(left + values.shape[1], index.shape[1]))
+            if rows.start >= rows.stop or columns.start >= columns.stop:
+                continue
+            values = values[rows.start - top:rows.stop - top, columns.start - left:columns.stop - left]
+            drawn = values > 0
+            current = y * size + x
+            shown = drawn & (ranks[rows, columns] <= current)
+            text_ranks[rows, columns][shown] = current
+            if values.shape != (mask.height, mask.width) or not np.array_equal(shown, drawn):
+                mask = Image.fromarray(np.where(shown, values, 0).astype(np.uint8), "L")
+            image.paste(TEXT_COLOR, (columns.start, rows.start), mask)
+
+    # a hex's overlays are drawn after its labels, covering those of the same or earlier hexes
+    if overlays:
+        pixels = np.frombuffer(image.convert("RGBX").tobytes(), dtype='<u4').reshape(index.shape).copy()
+        flat = pixels.reshape(-1)
+        for line, color in overlays:
+            line = line[ranks.flat[line] >= text_ranks.flat[line]]
+            flat[line] = color
+        image = Image.frombytes("RGB", (index.shape[1], index.shape[0]), pixels.tobytes(), "raw", "RGBX")
+    return image
+
+
+def render_layer(snapshot, number, engine="vector", cache_dir=RASTER_CACHE_DIR):
+    """
+    Draws a layer of a snapshot and saves it to its file in bin/
+    :param number: which of the snapshot's layers
+    :param engine: "vector" or "raster", see MapDraw
+    :return: seconds it took
+    """
+    start = time.perf_counter()
+    if engine == "raster":
+        raster = tuple(np.asarray(array) for array in hex_raster(snapshot.size, cache_dir))
+        image = draw_raster(snapshot, number, raster)
+    elif engine == "vector":
+        image = draw_vector(snapshot, number)
+    else:
+        raise ValueError("Unknown draw engine {}".format(engine))
+    image.save('bin/' + snapshot.layers[number].file_name)
+    return time.perf_counter() - start
+
+
+_worker_snapshot = None
+
+
+def _start_worker(snapshot, engine, cache_dir):
+    global _worker_snapshot
+    _worker_snapshot = snapshot, engine, cache_dir
+
+
+def _render_alone(number):
+    snapshot, engine, cache_dir = _worker_snapshot
+    return render_layer(snapshot, number, engine, cache_dir)
+
+
+def render_layers(snapshot, engine="vector", cache_dir=RASTER_CACHE_DIR, workers=1):
+    """
+    Draws and saves every layer of a snapshot, on a pool of processes when workers is more
+    than 1. The snapshot is sent to each process once
+    :param workers: number of processes, None for one per CPU
+    :return: seconds each layer took, in layer order
+    """
+    if engine == "raster":
+        hex_raster(snapshot.size, cache_dir) # made here once, so the workers can load it
+    numbers = range(len(snapshot.layers))
+    if workers == 1 or len(snapshot.layers) < 2:
+        return [render_layer(snapshot, number, engine, cache_dir) for number in numbers]
+
+    workers = min(workers or os.cpu_count(), len(snapshot.layers))
+    with ProcessPoolExecutor(workers, initializer=_start_worker, initargs=(snapshot, engine, cache_dir)) as pool:
+        return list(pool.map(_render_alone, numbers))
+
+
+class MapDraw:
+    """
+    Draws a hexagon grid to an image for each Layer. The colors, labels and overlay sides
+    of every layer are taken in one walk over the grid, then the layers are drawn and saved
+    independently, in parallel when workers is more than 1. For debugging and development purposes
+    """
+
+    def __init__(self, grid, layers, engine="vector", cache_dir=RASTER_CACHE_DIR, workers=1):
+        """
+        :param engine: "vector" draws every hexagon with PIL, "raster" colors a cached
+                       pixel to hex raster with numpy and only draws text with PIL
+        :param cache_dir: where the raster engine keeps its rasters
+        :param workers: processes drawing layers at once, None for one per CPU
+        """
+        self.Grid = grid
+        self.layers = layers
+
+        with Timer("Making {}".format(", ".join(layer.file_name for layer in layers)), True):
+            self.snapshot = MapSnapshot(grid, layers)
+            self.timings = render_layers(self.snapshot, engine, cache_dir, workers)
+        for layer, seconds in zip(layers, self.timings):
+            print("  {}".format(layer.file_name).ljust(50), end="")
+            print("drawn in {:0.03f} ms".format(seconds * 1000))
+
+
+class HexGridDraw(MapDraw):
+    """
+    Draws a hexagon grid to a single image. For debugging and development purposes
+    """
+
+    def __init__(self, grid, color_func, file_name, rivers=True,
+                 numbers=False, show_coasts=False, borders=False, text_func=None):
+        super().__init__(grid, [Layer(color_func, file_name, rivers=rivers, numbers=numbers,
+                                      show_coasts=show_coasts, borders=borders, text_func=text_func)])
@@ -1,27 +1,155 @@
-from enum import Enum
-import uuid
+import numpy as np
+
+from hexgen.enums import EdgeDirection, HexEdge, HexSide
+
+# HexSide of each side column, the column of the neighbor across that side in the neighbor table
+SIDES = [HexSide[edge.name] for edge in HexEdge.list()]
+SIDE_COLUMNS = dict((side, column) for column, side in enumerate(SIDES))
+
+# neighbor columns of the two hexes at the ends of the edge on each side
+SIDE_ENDS = np.array([
+    (HexEdge.north_east.id - 1, HexEdge.south_east.id - 1), # east
+    (HexEdge.north_west.id - 1, HexEdge.east.id - 1), # north east
+    (HexEdge.north_east.id - 1, HexEdge.west.id - 1), # north west
+    (HexEdge.north_west.id - 1, HexEdge.south_west.id - 1), # west
+    (HexEdge.south_east.id - 1, HexEdge.west.id - 1), # south west
+    (HexEdge.south_west.id - 1, HexEdge.east.id - 1), # south east
+])
+
+# EdgeDirection of each direction code, the last code is for edges without a direction
+DIRECTIONS = list(EdgeDirection) + [None]
+DIRECTION_CODES = dict((d, i) for i, d in enumerate(DIRECTIONS))
+
+
+class EdgeTable:
+    """
+    The edge on every side of every hex, as arrays of shape (size * size, 6) in side column
+    order. Both sides of an edge share its key in grid.edge_keys.
+    Slopes are kept for every side as the hex on that side sees them: when both end
+    hexes are level the first of its two ends is up, and the two hexes of an edge
+    list its ends in opposite orders. Slopes follow the altitude and are remade after invalidate()
+    """
+
+    def __init__(self, grid):
+        self.grid = grid
+        self._slopes = None
+
+    def invalidate(self):
+        """ Forgets the slopes, after altitude changes """
+        self._slopes = None
+
+    def _calculate_slopes(self):
+        size = self.grid.size
+        altitude = self.grid.altitude.ravel()
+        table = self.grid.neighbor_table
+        ends = table[:, SIDE_ENDS]
+        first, second = ends[:, :, 0], ends[:, :, 1]
+        first_lower = altitude[first] < altitude[second]
+        up = np.where(first_lower, second, first)
+        down = np.where(first_lower, first, second)
+
+        # which way the edge runs, from the neighbors of the hex it's seen from
+        around = dict((edge, table[:, edge.id - 1, np.newaxis]) for edge in HexEdge.list())
+        east, west = around[HexEdge.east], around[HexEdge.west]
+        rules = [
+            ((down == east) & (up == around[HexEdge.north_west]), EdgeDirection.south_east),
+            ((down == east) & (up == around[HexEdge.south_west]), EdgeDirection.north_east),
+            (down == east, None),
+            ((down == west) & (up == around[HexEdge.north_east]), EdgeDirection.south_west),
+            ((down == west) & (up == around[HexEdge.south_east]), EdgeDirection.north_west),
+            (down == west, None),
+            (down == around[HexEdge.north_west], EdgeDirection.north_west),
+            (down == around[HexEdge.north_east], EdgeDirection.north_east),
+            (down == around[HexEdge.south_west], EdgeDirection.south_west),
+            (down == around[HexEdge.south_east], EdgeDirection.south_east),
+        ]
+        direction = np.select([rule for rule, _ in rules], [DIRECTION_CODES[d] for _, d in rules],
+                              DIRECTION_CODES[None])
+        x = np.arange(size * size)[:, np.newaxis] // size
+        north = np.where(down // size < x, DIRECTION_CODES[EdgeDirection.north], DIRECTION_CODES[EdgeDirection.south])
+        direction = np.where(table // size == x, north, direction)
+        return dict(up=up, down=down, delta=altitude[up] - altitude[down], direction=direction.astype(np.int8))
+
+    def _slope(self, name):
+        if self._slopes is None:
+            self._slopes = self._calculate_slopes()
+        return self._slopes[name]
+
+    @property
+    def up(self):
+        """ Higher of the two hexes at the ends of the edge on every side, shape (size * size, 6) """
+        return self._slope('up')
+
+    @property
+    def down(self):
+        """ Lower of the two hexes at the ends of the edge on every side, shape (size * size, 6) """
+        return self._slope('down')
+
+    @property
+    def delta(self):
+        """ Altitude of the up hex less the altitude of the down hex, shape (size * size, 6) """
+        return self._slope('delta')
+
+    @property
+    def direction(self):
+        """ Direction code of the edge on every side, an index into DIRECTIONS, shape (size * size, 6) """
+        return self._slope('direction')
+
+    @property
+    def river(self):
+        """ True for sides of hexes a river flows along, shape (size * size, 6) """
+        owners = np.fromiter(self.grid.river_registry.owners, dtype=np.int64)
+        return np.isin(self.grid.edge_keys, owners)
+
+    @property
+    def coast(self):
+        """ True for sides of hexes between land and water, shape (size * size, 6) """
+        land = self.grid.land.ravel()
+        return land[:, np.newaxis] != land[self.grid.neighbor_table]
 
 
 class Edge:
-    def __init__(self, side, one, two, up, down):
-        """
-            One and Two are Hexes on both sides.
-            Up is the Hex upslope of the edge and Down is the Hex downslope
-        """
-        self.side = side
-        self.one = one
-        self.two = two
-        self.up = up
-        self.down = down
-        self.delta = self.up.altitude - self.down.altitude
-        self.id = uuid.uuid4()
+    """ An edge of the grid seen from the hex on one side, a view of its EdgeTable entries """
 
-        self.is_river = False
+    def __init__(self, grid, index, side):
+        self.grid = grid
+        self.index = index # hex this edge is seen from
+        self.side = side
+        self.column = SIDE_COLUMNS[side]
 
     def __repr__(self):
         return "<Edge Side: {}, One: {}, Two: {}, " \
                "Down: {}, delta: {}, direction: {}>".format(self.side, self.one, self.two, self.down, self.delta, self.direction)
 
+    @property
+    def one(self):
+        return self.grid.hex_at_index(self.index)
+
+    @property
+    def two(self):
+        return self.grid.hex_at_index(self.grid.neighbor_table[self.index, self.column])
+
+    @property
+    def up(self):
+        return self.grid.hex_at_index(self.grid.edges.up[self.index, self.column])
+
+    @property
+    def down(self):
+        return self.grid.hex_at_index(self.grid.edges.down[self.index, self.column])
+
+    @property
+    def delta(self):
+        return int(self.grid.edges.delta[self.index, self.column])
+
+    @property
+    def key(self):
+        """ Canonical id of this edge, shared with the edge on the other side """
+        return int(self.grid.edge_keys[self.index, self.column])
+
+    @property
+    def is_river(self):
+        return self.key in self.grid.river_registry
+
     @property
     def is_coast(self):
         return self.one.is_water and self.two.is_land or \
@@ -29,30 +157,7 @@ class Edge:
 
     @property
     def direction(self):
-        if self.one.x == self.two.x:
-            if self.down.x < self.one.x:
-                return EdgeDirection.north
-            else:
-                return EdgeDirection.south
-        else:
-            if self.down == self.one.hex_east:
-                if self.up == self.one.hex_north_west:
-                    return EdgeDirection.south_east
-                elif self.up == self.one.hex_south_west:
-                    return EdgeDirection.north_east
-            elif self.down == self.one.hex_west:
-                if self.up == self.one.hex_north_east:
-                    return EdgeDirection.south_west
-                elif self.up == self.one.hex_south_east:
-                    return EdgeDirection.north_west
-            elif self.down == self.one.hex_north_west:
-                return EdgeDirection.north_west
-            elif self.down == self.one.hex_north_east:
-                return EdgeDirection.north_east
-            elif self.down == self.one.hex_south_west:
-                return EdgeDirection.south_west
-            elif self.down == self.one.hex_south_east:
-                return EdgeDirection.south_east
+        return DIRECTIONS[self.grid.edges.direction[self.index, self.column]]
 
     def __eq__(self, other):
         """
@@ -60,8 +165,7 @@ class Edge:
         :return: True if both edges are equal to each other
         Eg: A Hex's south-east is equal to the bottom-left's north-west
         """
-        return other.one == self.two or (self.one == other.one and self.two == other.two)
-
-from hexgen.hex import HexSide
+        return self.key == other.key
 
-from hexgen.enums import EdgeDirection
+    def __hash__(self):
+        return hash(self.key)
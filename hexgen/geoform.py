@@ -1,17 +1,28 @@
 import uuid
+import numpy as np
 
 class Geoform:
     """ A landmass or water feature """
-    def __init__(self, hexes, geotype):
+    def __init__(self, grid, indexes, geotype):
+        self.grid = grid
         self.type = geotype # GeoformType
-        self.hexes = hexes # set
-        self.size = len(hexes)
+        self.size = len(indexes)
         self.id = uuid.uuid4() # uuid
+        self.index = None # id in the grid's geoform array
         self.neighbors = set() # set
         self.to_delete = False
+        self.parent = self # union-find parent, the geoform this one was merged into
+        self.parts = [] # ids of every geoform merged into this one
 
-        for h in hexes:
-            h.geoform = self
+        grid.register_geoform(self)
+        self.parts.append(self.index)
+        grid.geoform_id.ravel()[indexes] = self.index
+
+    @property
+    def hexes(self):
+        """ set of hexes in this geoform """
+        indexes = np.flatnonzero(np.isin(self.grid.geoform_id, self.parts))
+        return set(self.grid.hex_at_index(i) for i in indexes)
 
     def to_dict(self):
         """ Dictionary representation """
@@ -37,18 +48,32 @@ class Geoform:
             result.extend(self.neighbor_of_type(t))
         return result
 
+    def find(self):
+        """ The geoform this one has been merged into, or itself """
+        root = self
+        while root.parent is not root:
+            root.parent = root.parent.parent
+            root = root.parent
+        return root
+
     def merge(self, other):
         """ Merge another Geoform into this one """
-        # add their hexes to mine
-        self.hexes.update(other.hexes)
-        self.size += len(other.hexes)
-        # set their hexes to me
-        for h in other.hexes:
-            h.geoform = self
-        # empty their hexes
-        other.hexes = set()
+        if other is self:
+            return
+        self.size += other.size
+        self.parts.extend(other.parts)
+        # their neighbors become mine
+        for n in other.neighbors:
+            n.neighbors.discard(other)
+            if n is not self:
+                n.neighbors.add(self)
+                self.neighbors.add(n)
+        self.neighbors.discard(other)
+        # empty them and mark them to be deleted
+        other.neighbors = set()
+        other.parts = []
         other.size = 0
-        # mark them to be deleted
+        other.parent = self
         other.to_delete = True
 
     def is_geotype(self, geotype):
@@ -66,3 +91,30 @@ class Geoform:
 
     def __str__(self):
         return "<Geoform: type: {}, size: {}, id: {}>".format(self.type.title, self.size, self.id)
+
+
+def link_geoforms(grid):
+    """ Fills in the neighbors of every geoform on a grid from the edges between them """
+    ids = grid.geoform_id.ravel()
+    one = np.repeat(ids, 6)
+    two = ids[grid.neighbor_table.ravel()]
+    boundary = (one != two) & (one >= 0) & (two >= 0)
+    pairs = np.unique(np.stack([one[boundary], two[boundary]], axis=1), axis=0)
+    geoforms = grid.geoforms
+    for a, b in pairs:
+        geoforms[a].neighbors.add(geoforms[b])
+
+
+def resolve_geoforms(grid):
+    """ Drops merged geoforms and points every hex at the geoform it was merged into """
+    kept = [g for g in grid.geoforms if not g.to_delete]
+    remap = np.full(len(grid.geoforms) + 1, -1, dtype=np.int32)
+    for number, g in enumerate(kept):
+        remap[g.index] = number
+    roots = np.array([g.find().index for g in grid.geoforms] + [-1], dtype=np.int32)
+    grid.geoform_id[:] = remap[roots[grid.geoform_id]]
+    for number, g in enumerate(kept):
+        g.index = number
+        g.parts = [number]
+    grid.geoforms = kept
+    return kept
@@ -1,13 +1,27 @@
 import math
+import uuid
 from copy import copy
 import numpy as np
 from hexgen.hex import Hex
+from hexgen.enums import HexEdge, Zones
+from hexgen.river import RiverRegistry
+from hexgen.biome import classify_biomes
+from hexgen.neighborhood import Neighborhood
+from hexgen.edge import Edge, EdgeTable
 
 class GridBoundsException(Exception):
     pass
 
 
 class Grid:
+    """
+    Hex grid. Every per-hex value lives in a typed numpy array indexed by [x, y].
+
+    With the "objects" backend a Hex instance is made for every cell up front
+    and its edges are calculated eagerly. With the "columnar" backend only the
+    arrays exist and find_hex returns a lightweight Hex view on demand.
+    """
+
     def __init__(self, heightmap, params, debug=False):
         self.heightmap = heightmap
         self.sealevel = heightmap.sealevel
@@ -15,47 +29,440 @@ class Grid:
         self.average_height = heightmap.average_height
         self.highest_height = heightmap.highest_height
         self.lowest_height = heightmap.lowest_height
+        self.size = heightmap.size
+        self.backend = params.get('grid_backend', 'objects')
+        self.id = uuid.uuid4()
 
         self.avg_altitude = 0
 
-        self.hexes = []
-        self.coldest_hexes = []
+        self._hexes = None
+        self._hex_ids = None
+        self._base_temperature = None
+        self._temperature = None
+        self._biome_id = None
+        self._rows = None  # ((size, axial tilt), per-row latitude values)
+        self.temperature_order = None
+        self.coldest = None
 
         if debug:
             print("Making grid")
-        self.num_ocean_hexes = 0
-        self.grid = np.ndarray((self.heightmap.size, self.heightmap.size), dtype=np.object)
-        for y, row in enumerate(self.grid):
-            for x, col in enumerate(row):
-                self.grid[x][y] = Hex(self, x, y, self.heightmap.height_at(x, y))
-                if self.grid[x][y].is_water:
-                    self.num_ocean_hexes += 1
+        size = self.size
+        shape = (size, size)
+        seasons = (size, size, 2)
+        world_pressure = self.params.get('surface_pressure')
+
+        self.altitude = np.asarray(self.heightmap.grid, dtype=np.int32)
+        self.moisture = np.zeros(shape, dtype=np.int32)
+        self.distance = np.zeros(shape, dtype=np.int32)  # distance in hexes to the coast
+        self.pressure = np.full(seasons, world_pressure, dtype=np.float64)
+        self.wind_direction = np.zeros(seasons, dtype=np.int8)  # HexEdge id, 0 for no wind
+        self.wind_target = np.full(seasons, -1, dtype=np.int32)  # index of the windward hex
+        self.wind_pressure_diff = np.zeros(seasons, dtype=np.float32)
+        self.wind_temp_effect = np.zeros(seasons, dtype=np.float64)
+        self.territory_id = np.full(shape, -1, dtype=np.int32)
+        self.geoform_id = np.full(shape, -1, dtype=np.int32)
+        self.geoform_type = np.zeros(shape, dtype=np.int8)  # GeoformType id, 0 for none
+        self.features = np.zeros(shape, dtype=np.uint8)  # HexFeature bitmask
+        self.resource_type = np.zeros(shape, dtype=np.int8)  # HexResourceType id, 0 for none
+        self.resource_rating = np.zeros(shape, dtype=np.int8)  # HexResourceRating id, 0 for none
+
+        self.territories = dict()  # territory id -> Territory
+        self.geoforms = []  # geoform id -> Geoform
+
+        self.num_ocean_hexes = int(np.count_nonzero(self.altitude < self.sealevel))
+
+        # neighbor indexes of each hex in HexEdge order, wrapping about the map
+        self.neighbor_table = self._build_neighbor_table()
+        # neighbor indexes without wrapping, -1 where the map ends
+        self.map_neighbor_table = self._build_map_neighbor_table()
+        # canonical id of every edge, the same from both hexes that share it
+        self.edge_keys = self._build_edge_keys()
+        # one record for each edge, shared by the hexes on both sides
+        self.edges = EdgeTable(self)
+        # hexes within a radius of other hexes
+        self.neighborhood = Neighborhood(self)
+        self.river_registry = RiverRegistry()
+
+        if self.backend == 'objects':
+            self.grid = np.ndarray(shape, dtype=object)
+            for x in range(size):
+                for y in range(size):
+                    self.grid[x][y] = Hex(self, x, y)
+        elif self.backend == 'columnar':
+            self.grid = None
+        else:
+            raise ValueError("Unknown grid backend {}".format(self.backend))
 
         self.calculate()
 
     @property
-    def size(self):
-        return self.params.get('size')
+    def land(self):
+        """ Boolean array, True for hexes at or above sea level """
+        return self.altitude >= self.sealevel
 
     def find_hex(self, x, y):
         """ Finds a hex and a x and y coordinate """
-        try:
-            return self.grid[x][y]
-        except IndexError:
+        if self.grid is not None:
+            try:
+                return self.grid[x][y]
+            except IndexError:
+                raise GridBoundsException("Invalid coordinates {}, {}".format(x, y))
+        size = self.size
+        if not (-size <= x < size and -size <= y < size):
             raise GridBoundsException("Invalid coordinates {}, {}".format(x, y))
+        return Hex(self, x % size, y % size)
+
+    @property
+    def hex_ids(self):
+        """ uuid of every hex by flat index, made once from the grid's id and the hex's position """
+        if self._hex_ids is None:
+            size = self.size
+            self._hex_ids = [uuid.uuid5(self.id, "{},{}".format(x, y)) for x in range(size) for y in range(size)]
+        return self._hex_ids
+
+    def hex_at_index(self, index):
+        """ Finds a hex by its flat index (x * size + y) """
+        return self.find_hex(*divmod(int(index), self.size))
+
+    def _build_neighbor_table(self):
+        """ (size * size, 6) int32 array of neighbor indexes in HexEdge order """
+        size = self.size
+        last = size - 1
+        x, y = np.divmod(np.arange(size * size), size)
+        odd = x % 2 == 1
+        top = x == 0
+        bottom = x == last
+        east = (y + 1) % size
+        west = (y - 1) % size
+        mirrored = last - y
+
+        table = np.empty((size * size, 6), dtype=np.int32)
+        table[:, HexEdge.east.id - 1] = x * size + east
+        table[:, HexEdge.west.id - 1] = x * size + west
+        # the top and bottom rows wrap onto themselves, mirrored
+        table[:, HexEdge.north_east.id - 1] = np.where(
+            top, mirrored, (x - 1) * size + np.where(odd, east, y))
+        table[:, HexEdge.north_west.id - 1] = np.where(
+            top, mirrored, (x - 1) * size + np.where(odd, y, west))
+        table[:, HexEdge.south_east.id - 1] = np.where(
+            bottom, last * size + mirrored, (x + 1) * size + np.where(odd, east, y))
+        table[:, HexEdge.south_west.id - 1] = np.where(
+            bottom, last * size + mirrored, (x + 1) * size + np.where(odd, y, west))
+        return table
+
+    def _build_map_neighbor_table(self):
+        """ Like the neighbor table, but -1 where a neighbor would wrap about the map """
+        size = self.size
+        last = size - 1
+        x, y = np.divmod(np.arange(size * size), size)
+        # as map_surrounding always has, the diagonals on the west side are left out in the first
+        # column and those on the east side in the last, for both row parities. Only even rows
+        # wrap there in the west and odd rows in the east, so a few links only go one way
+        west_edge = y == 0
+        east_edge = y == last
+        table = self.neighbor_table.copy()
+        table[y == last, HexEdge.east.id - 1] = -1
+        table[y == 0, HexEdge.west.id - 1] = -1
+        table[(x == 0) | west_edge, HexEdge.north_west.id - 1] = -1
+        table[(x == 0) | east_edge, HexEdge.north_east.id - 1] = -1
+        table[(x == last) | west_edge, HexEdge.south_west.id - 1] = -1
+        table[(x == last) | east_edge, HexEdge.south_east.id - 1] = -1
+        return table
+
+    def _build_edge_keys(self):
+        """
+        (size * size, 6) int64 array of edge ids in HexEdge order.
+        The id of an edge is the smallest of index * 6 + column from either hex.
+        """
+        count = self.size * self.size
+        table = self.neighbor_table
+        index = np.arange(count)[:, np.newaxis]
+        columns = np.arange(6)
+        # the edge on the other side is usually the opposite column, but the top and
+        # bottom rows wrap onto themselves mirrored, so north west meets north east there
+        opposite = (columns + 3) % 6
+        mirrored = np.array([HexEdge.west, HexEdge.north_west, HexEdge.north_east,
+                             HexEdge.east, HexEdge.south_east, HexEdge.south_west])
+        mirrored = np.array([e.id - 1 for e in mirrored])
+        back = np.where(table[table, opposite] == index, opposite, mirrored)
+        return np.minimum(index * 6 + columns, table.astype(np.int64) * 6 + back)
+
+    def gather_neighbors(self, values, wrap=True, fill=0):
+        """
+        Values of the neighbors of every hex
+        :param values: array of shape (size, size, ...)
+        :param wrap: if False, neighbors past the edge of the map are given fill
+        :return: array of shape (size * size, 6, ...) in HexEdge order
+        """
+        flat = np.asarray(values).reshape((self.size * self.size,) + np.shape(values)[2:])
+        if wrap:
+            return flat[self.neighbor_table]
+        table = self.map_neighbor_table
+        result = flat[table]
+        result[table < 0] = fill
+        return result
+
+    def distance_field(self, sources, wrap=True):
+        """
+        Multi-source breadth first search over the hex neighbor graph
+        :param sources: boolean array of shape (size, size)
+        :param wrap: if False, don't walk about the edges of the map
+        :return: int32 array of the distance in hexes to the nearest source, -1 if there is none
+        """
+        table = self.neighbor_table if wrap else self.map_neighbor_table
+        distance = np.full(self.size * self.size, -1, dtype=np.int32)
+        frontier = np.flatnonzero(sources)
+        distance[frontier] = 0
+        level = 0
+        while len(frontier) > 0:
+            level += 1
+            around = table[frontier].ravel()
+            if not wrap:
+                around = around[around >= 0]
+            frontier = np.unique(around[distance[around] < 0])
+            distance[frontier] = level
+        return distance.reshape(self.size, self.size)
+
+    def ball_sum(self, values, radius):
+        """
+        Sums values over every hex within radius hexes of each hex, itself included
+        :param values: array of shape (size, size)
+        :return: array of shape (size, size)
+        """
+        return self.neighborhood.sum(values, radius)
+
+    def advect(self, values, iterations=20, rate=0.1):
+        """
+        Carries seasonal values downwind. Every iteration, each hex with wind trades
+        rate times its difference with its windward hex, all hexes at once
+        :param values: array of shape (size, size, 2), one value for each season
+        :param iterations: number of steps downwind
+        :param rate: share of the difference traded in a step, below 1/7 to stay stable
+        :return: float64 array of shape (size, size, 2)
+        """
+        count = self.size * self.size
+        result = np.array(values, dtype=np.float64).reshape(count, 2)
+        directions = self.wind_direction.reshape(count, 2)
+        targets = self.wind_target.reshape(count, 2)
+        for season in range(2):
+            source = np.flatnonzero(directions[:, season] > 0)
+            target = targets[source, season]
+            current = result[:, season]
+            for _ in range(iterations):
+                flow = rate * (current[source] - current[target])
+                current += np.bincount(target, flow, count) - np.bincount(source, flow, count)
+        return result.reshape(self.size, self.size, 2)
+
+    def grow_regions(self, seeds, rng=None, chance=1.0, wrap=True):
+        """
+        Grows regions out from their seed hexes all at once, breadth first,
+        until every reachable hex is taken
+        :param seeds: flat indexes of the hex each region starts from, region i starts at seeds[i]
+        :param rng: numpy Generator. A hex claimed by more than one region in the same round
+                    goes to a random one, without it the earliest claim wins
+        :param chance: chance of a region growing into each free neighbor in a round, more than 0
+                       and at most 1, needs rng below 1
+        :param wrap: if False, don't grow about the edges of the map
+        :return: int32 array of shape (size, size) of region numbers, -1 for hexes not reached
+        """
+        if not 0 < chance <= 1:
+            raise ValueError("Chance of a region growing must be more than 0 and at most 1")
+        if chance < 1 and rng is None:
+            raise ValueError("Growing regions by chance needs a random generator")
+        table = self.neighbor_table if wrap else self.map_neighbor_table
+        owner = np.full(self.size * self.size, -1, dtype=np.int32)
+        frontier = np.asarray(seeds, dtype=np.int64)
+        owner[frontier] = np.arange(len(frontier))
+        while len(frontier) > 0:
+            source = np.repeat(frontier, 6)
+            around = table[frontier].ravel()
+            free = (around >= 0) & (owner[np.maximum(around, 0)] < 0)
+            source, around = source[free], around[free]
+            stalled = np.empty(0, dtype=np.int64)
+            if chance < 1:
+                grows = rng.random(len(around)) < chance
+                # hexes that didn't grow everywhere they could try again next round
+                stalled = np.unique(source[~grows])
+                source, around = source[grows], around[grows]
+            if rng is not None:
+                order = rng.permutation(len(around))
+                source, around = source[order], around[order]
+            claimed, first = np.unique(around, return_index=True)
+            owner[claimed] = owner[source[first]]
+            frontier = np.concatenate([claimed, stalled])
+        return owner.reshape(self.size, self.size)
+
+    def label_components(self, classes, wrap=True):
+        """
+        Labels every contiguous group of hexes of the same class
+        :param classes: int array of shape (size, size). Hexes with a negative class are left out
+        :param wrap: if False, groups don't continue about the edges of the map
+        :return: (labels, sizes) where labels is an int32 array of shape (size, size) numbering
+                 each group from 0, in the order of its first hex, and -1 for left out hexes;
+                 sizes is the number of hexes in each group
+        """
+        flat = np.asarray(classes).ravel()
+        count = len(flat)
+        table = self.neighbor_table if wrap else self.map_neighbor_table
+        one = np.repeat(np.arange(count), 6)
+        two = table.ravel()
+        linked = (two >= 0) & (flat[one] >= 0)
+        one, two = one[linked], two[linked]
+        linked = (flat[two] == flat[one]) & (one != two)
+        one, two = one[linked], two[linked]
+
+        # union-find by hooking roots onto the smallest root they touch,
+        # then following parents until every hex points at its root
+        parent = np.arange(count)
+        while len(one) > 0:
+            root_one, root_two = parent[one], parent[two]
+            np.minimum.at(parent, np.maximum(root_one, root_two), np.minimum(root_one, root_two))
+            while True:
+                grandparent = parent[parent]
+                if (grandparent == parent).all():
+                    break
+                parent = grandparent
+            linked = parent[one] != parent[two]
+            one, two = one[linked], two[linked]
+
+        labels = np.full(count, -1, dtype=np.int32)
+        included = flat >= 0
+        roots, inverse, sizes = np.unique(parent[included], return_inverse=True, return_counts=True)
+        labels[included] = inverse.ravel()
+        return labels.reshape(self.size, self.size), sizes
+
+    def register_geoform(self, geoform):
+        """ Gives a Geoform an id in this grid's geoform array """
+        geoform.index = len(self.geoforms)
+        self.geoforms.append(geoform)
+        return geoform.index
+
+    def get_edge(self, h, side):
+        """ Gets the Edge on the given HexSide of a hex """
+        return Edge(self, h.index, side)
+
+    @property
+    def hexes(self):
+        """ All hexes, coldest first """
+        if self._hexes is None:
+            self._hexes = [self.hex_at_index(i) for i in self.temperature_order]
+        return self._hexes
+
+    @property
+    def coldest_hexes(self):
+        number = round(len(self.temperature_order) * 0.10)
+        return [self.hex_at_index(i) for i in self.temperature_order[:number]]
+
+    def _calculate_rows(self):
+        """ Latitude, latitude ratio, hemisphere and zone of every row """
+        size = self.size
+        ratio = np.arange(size) / size
+        latitude = np.where(ratio < 0.5, (1 - ratio / 0.5) * 90, (ratio / 0.5) * -90 + 90)
+        latitude_ratio = np.where(ratio < 0.5, ratio / 0.5, (1 - ratio) / 0.5)
+        northern = np.arange(size) <= round(size / 2)
+
+        # zones from the north pole to the south pole, each up to and including its northern bound
+        axial_tilt = abs(self.params.get('axial_tilt'))
+        bounds = [90, 90 - axial_tilt, axial_tilt + (axial_tilt / 2), axial_tilt, 0,
+                  -axial_tilt, -(axial_tilt + (axial_tilt / 2)), -(90 - axial_tilt), -90]
+        zone_list = Zones.list()
+        conditions = [(low < latitude) & (latitude <= high) for high, low in zip(bounds, bounds[1:])]
+        zone_index = np.select(conditions, np.arange(len(zone_list)), -1)
+        zones = [zone_list[i] if i >= 0 else None for i in zone_index]
+        zone_incr = np.array([zone.incr if zone else 0 for zone in zones])
+        return dict(latitude=latitude, latitude_ratio=latitude_ratio, northern=northern,
+                    zones=zones, zone_incr=zone_incr)
+
+    def _row_values(self, name):
+        """ A per-row latitude value, remade only when the size or axial tilt change """
+        key = (self.size, self.params.get('axial_tilt'))
+        if self._rows is None or self._rows[0] != key:
+            self._rows = (key, self._calculate_rows())
+        return self._rows[1][name]
+
+    @property
+    def latitude(self):
+        """ Latitude of every row in degrees. Negative is south, positive is north """
+        return self._row_values('latitude')
+
+    @property
+    def latitude_ratio(self):
+        """ Every row's distance from the nearest pole, 0 at the poles and 1 at the equator """
+        return self._row_values('latitude_ratio')
+
+    @property
+    def northern(self):
+        """ True for the rows in the northern hemisphere """
+        return self._row_values('northern')
+
+    @property
+    def zones(self):
+        """ The Zones member of every row """
+        return self._row_values('zones')
+
+    @property
+    def zone_incr(self):
+        """ Zones.incr of every row """
+        return self._row_values('zone_incr')
+
+    def _calculate_base_temperature(self):
+        """ Base temperature of every hex from its latitude and altitude """
+        ratio = self.latitude_ratio
+        avg_temp = self.params.get('avg_temp')
+        volitility = round(abs(self.params.get('axial_tilt')))
+        base_temp = self.params.get('base_temp')
+        min_temp = max(avg_temp - volitility, base_temp)
+        part1 = (abs(min_temp) + (avg_temp + volitility)) * ratio + min_temp
+        factor = np.where(self.land, 7, 8)
+        part2 = np.abs(self.altitude - self.sealevel) / factor
+        return np.round(part1, 2)[:, np.newaxis] - np.round(part2, 2)
+
+    @property
+    def base_temperature(self):
+        """ Base temperature of every hex, the same in both seasons. Cached until invalidated """
+        if self._base_temperature is None:
+            self._base_temperature = self._calculate_base_temperature()
+        return self._base_temperature
+
+    @property
+    def temperature(self):
+        """ Seasonal temperature of every hex with wind effects, shape (size, size, 2). Cached until invalidated """
+        if self._temperature is None:
+            self._temperature = self.base_temperature[:, :, np.newaxis] + self.wind_temp_effect
+        return self._temperature
+
+    def invalidate_altitude(self):
+        """ Forgets everything cached from the altitude, after it changes """
+        self.edges.invalidate()
+        self.invalidate_temperature()
+
+    def invalidate_temperature(self):
+        """ Forgets the cached temperatures, after altitude or wind_temp_effect change """
+        self._base_temperature = None
+        self._temperature = None
+        self._biome_id = None
+
+    @property
+    def biome_id(self):
+        """ Biome of every hex as an id into hex.BIOMES. Cached until invalidated """
+        if self._biome_id is None:
+            self._biome_id = classify_biomes(self)
+        return self._biome_id
+
+    def invalidate_biomes(self):
+        """ Forgets the cached biomes, after moisture or features change """
+        self._biome_id = None
 
     def calculate(self):
-        # run through the grid, calculate the edges
-        alt = 0
-        hexes = []
-        for y, row in enumerate(self.grid):
-            for x, col in enumerate(row):
-                self.grid[x][y].calculate()
-                alt += self.grid[x][y].altitude
-                hexes.append(self.grid[x][y])
-        self.avg_altitude = round(alt / math.pow(self.size, 2) )
-
-        self.hexes = sorted(hexes, key=lambda x: x.temperature)
-
-        number = round(len(self.hexes) * 0.10)
-        self.coldest_hexes = self.hexes[:number]
+        self.avg_altitude = round(int(self.altitude.sum()) / math.pow(self.size, 2))
+
+        # order hexes by temperature, visiting columns first like the hex list used to
+        size = self.size
+        self.invalidate_temperature()
+        order = np.argsort(self.base_temperature.ravel(order='F'), kind='stable')
+        self.temperature_order = (order % size) * size + order // size
+        self._hexes = None
+
+        number = round(len(order) * 0.10)
+        self.coldest = np.zeros((size, size), dtype=bool)
+        self.coldest.ravel()[self.temperature_order[:number]] = True
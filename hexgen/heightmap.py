@@ -9,23 +9,25 @@ class Heightmap:
 
         # start making the heightmap
         self.size = params.get('size')
-        self.grid = np.zeros((self.size, self.size))
-        self.grid[0][0] = random.randint(0, 255)
-        self.grid[self.size - 1][0] = random.randint(0, 255)
-        self.grid[0][self.size - 1] = random.randint(0, 255)
-        self.grid[self.size - 1][self.size - 1] = random.randint(0, 255)
-        self._subdivide(0, 0, self.size - 1, self.size - 1)
+        engine = params.get('heightmap_engine', 'recursive')
+        if engine == 'iterative':
+            self.rng = np.random.default_rng(params.get('random_seed'))
+            self.grid = self._generate_iterative()
+        elif engine == 'recursive':
+            self.grid = np.zeros((self.size, self.size))
+            self.grid[0][0] = random.randint(0, 255)
+            self.grid[self.size - 1][0] = random.randint(0, 255)
+            self.grid[0][self.size - 1] = random.randint(0, 255)
+            self.grid[self.size - 1][self.size - 1] = random.randint(0, 255)
+            self._subdivide(0, 0, self.size - 1, self.size - 1)
+        else:
+            raise ValueError("Unknown heightmap engine {}".format(engine))
 
         # compute average and record top height
-        avg = []
-        m = []
-        for g in self.grid:
-            m.append(max(g))
-            avg.append(sum(g) / float(len(g)))
-
-        self.highest_height = max(m)
-        self.lowest_height = min(m)
-        self.average_height = sum(avg) / float(len(avg))
+        row_max = self.grid.max(axis=1)
+        self.highest_height = row_max.max()
+        self.lowest_height = row_max.min()
+        self.average_height = self.grid.mean(axis=1).mean()
         sea_percent = params.get('sea_percent')
         self.sealevel = round(self.average_height * (sea_percent * 2 / 100))
 
@@ -83,3 +85,77 @@ class Heightmap:
             self._subdivide(x, y1, x2, y)
             self._subdivide(x, y, x2, y2)
             self._subdivide(x1, y, x, y2)
+
+    def _generate_iterative(self):
+        """
+        Diamond-square one level at a time with whole-level array operations.
+
+        The heightmap is built on a (2^k + 1) square that is periodic
+        horizontally and mirrored along its top and bottom rows, the same way
+        _adjust wraps the sides of the map, and is then sampled down to size.
+        """
+        roughness = self.params.get('roughness')
+        range_low, range_high = self.params.get('height_range')
+
+        period = 2
+        while period < self.size - 1:
+            period *= 2
+        last = period  # index of the bottom row
+        grid = np.zeros((period + 1, period))
+        grid[0, 0] = self.rng.integers(0, 256)
+        grid[last, 0] = self.rng.integers(0, 256)
+
+        mirror = np.arange(1, period // 2)
+
+        def edge_value(total, count, step):
+            """ average of the neighbors plus noise, folded like _adjust """
+            noise = (self.rng.random(total.shape) - 0.5) * step * roughness
+            v = np.floor(np.fabs(total / count + noise) % 257)
+            return np.clip(v, range_low, range_high)
+
+        step = period
+        while step > 1:
+            half = step // 2
+            rows = np.arange(half, last, step)
+            cols = np.arange(half, period, step)
+            cols_left = cols - half
+            cols_right = (cols + half) % period
+
+            # diamond step: centers are the average of their four corners
+            top = grid[rows - half]
+            bottom = grid[rows + half]
+            centers = (top[:, cols_left] + top[:, cols_right] +
+                       bottom[:, cols_left] + bottom[:, cols_right]) / 4
+            grid[np.ix_(rows, cols)] = np.clip(np.floor(centers), range_low, range_high)
+
+            # square step, points between two corners on the same row
+            edge_rows = np.arange(0, last + 1, step)
+            total = grid[np.ix_(edge_rows, cols_left)] + grid[np.ix_(edge_rows, cols_right)]
+            count = np.full(total.shape, 2.0)
+            above = edge_rows >= half
+            below = edge_rows + half <= last
+            total[above] += grid[np.ix_(edge_rows[above] - half, cols)]
+            total[below] += grid[np.ix_(edge_rows[below] + half, cols)]
+            count[above] += 1
+            count[below] += 1
+            grid[np.ix_(edge_rows, cols)] = edge_value(total, count, step)
+
+            # square step, points between two corners on the same column
+            edge_cols = np.arange(0, period, step)
+            total = grid[np.ix_(rows - half, edge_cols)] + grid[np.ix_(rows + half, edge_cols)] + \
+                grid[np.ix_(rows, (edge_cols - half) % period)] + \
+                grid[np.ix_(rows, (edge_cols + half) % period)]
+            grid[np.ix_(rows, edge_cols)] = edge_value(total, 4.0, step)
+
+            # the top and bottom rows wrap onto themselves
+            grid[0, period - mirror] = grid[0, mirror]
+            grid[last, period - mirror] = grid[last, mirror]
+
+            step = half
+
+        grid = np.concatenate([grid, grid[:, :1]], axis=1)
+        if self.size == 1:
+            return grid[:1, :1]
+        # rint rounds halves to even, which keeps the sampling symmetric
+        index = np.rint(np.arange(self.size) * period / (self.size - 1)).astype(int)
+        return grid[np.ix_(index, index)]
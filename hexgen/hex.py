@@ -1,59 +1,174 @@
-import uuid
 import math
 import random
 from enum import Enum
 
 from hexgen.constants import *
-from hexgen.enums import Biome, MapType, HexType, HexFeature, HexSide, Zones, Hemisphere, HexEdge
-from hexgen.util import blend_colors, lighten, randomize_color, pressure_at_seasons, decide_wind, is_opposite_hex, memoized
+from hexgen.enums import Biome, MapType, HexType, HexFeature, HexSide, Hemisphere, HexEdge, GeoformType, \
+                         HexResourceType, HexResourceRating
+from hexgen.util import blend_colors, lighten, randomize_color, pressure_at_seasons, decide_wind, is_opposite_hex, memoized, \
+                        SURROUNDING_EDGES, MAP_SURROUNDING_EDGES
+
+
+# bit of each HexFeature in Grid.features
+FEATURE_BITS = dict((feature, 1 << i) for i, feature in enumerate(HexFeature))
+
+GEOFORM_TYPES = dict((g.id, g) for g in GeoformType)
+
+HEX_EDGES = dict((e.id, e) for e in HexEdge)
+
+RESOURCE_TYPES = dict((t.id, t) for t in HexResourceType)
+
+RESOURCE_RATINGS = dict((r.id, r) for r in HexResourceRating)
+
+BIOMES = Biome.list()
 
 
 class Hex:
-    def __init__(self, grid, x, y, altitude):
+    """
+    A view onto one cell of a Grid. All of the hex's values are stored in the grid's arrays.
+    """
+    __slots__ = ('grid', 'x', 'y', 'index')
+
+    def __init__(self, grid, x, y):
         self.x = x
         self.y = y
-        self.altitude = altitude
         self.grid = grid
+        self.index = x * grid.size + y
 
-        self.edge_east = None
-        self.edge_west = None
-        self.edge_north_east = None
-        self.edge_south_east = None
-        self.edge_north_west = None
-        self.edge_south_west = None
+        # if self.temperature[0] <= -12 or self.temperature[1] <= 12 and self.is_water:
+        #     # TODO: this should be better
+        # self.features.add(HexFeature.glacier)
 
-        self.distance = 0 # distance in hexes to the coast. 0 if no coast
-        self.moisture = 0
+    @property
+    def id(self):
+        return self.grid.hex_ids[self.index]
 
-        self.territory = None
-        self.marked = False # marked by the grouping algorithm
+    @property
+    def altitude(self):
+        return int(self.grid.altitude[self.x, self.y])
 
-        self.bubble_cache = dict()
+    @altitude.setter
+    def altitude(self, value):
+        self.grid.altitude[self.x, self.y] = value
+        self.grid.invalidate_altitude()
 
-        self.features = set()
+    @property
+    def moisture(self):
+        return int(self.grid.moisture[self.x, self.y])
 
-        # geoform type
-        self.geoform_type = None
+    @moisture.setter
+    def moisture(self, value):
+        self.grid.moisture[self.x, self.y] = value
+        self.grid.invalidate_biomes()
 
-        # geoform instance if it exists
-        self.geoform = None
+    @property
+    def distance(self):
+        """ distance in hexes to the coast. 0 if no coast """
+        return int(self.grid.distance[self.x, self.y])
 
-        self.resource = None
-        self._neighbors = None
+    @distance.setter
+    def distance(self, value):
+        self.grid.distance[self.x, self.y] = value
 
-        world_pressure = self.grid.params.get('surface_pressure')
-        self.pressure = (world_pressure, world_pressure)
-        self.wind = None
-        self.wind_temp_effect = [0, 0] # Seasonal tuple. Temp changes from pressure and wind
+    @property
+    def pressure(self):
+        """ Seasonal tuple """
+        return tuple(self.grid.pressure[self.x, self.y])
 
-        # instance of a sea
-        self.sea = None
+    @pressure.setter
+    def pressure(self, value):
+        self.grid.pressure[self.x, self.y] = value
 
-        self.id = uuid.uuid4()
+    @property
+    def wind(self):
+        """ Seasonal tuple of dicts with the wind direction, windward hex and pressure difference """
+        if self.grid.wind_target[self.x, self.y, 0] < 0:
+            return None
+        wind = []
+        for season in range(2):
+            direction = self.grid.wind_direction[self.x, self.y, season]
+            wind.append({
+                "direction": HEX_EDGES.get(direction),
+                "windward_hex": self.grid.hex_at_index(self.grid.wind_target[self.x, self.y, season]),
+                "pressure_diff": float(self.grid.wind_pressure_diff[self.x, self.y, season])
+            })
+        return tuple(wind)
 
-        # if self.temperature[0] <= -12 or self.temperature[1] <= 12 and self.is_water:
-        #     # TODO: this should be better
-        # self.features.add(HexFeature.glacier)
+    @wind.setter
+    def wind(self, value):
+        for season, wind in enumerate(value):
+            direction = wind.get('direction')
+            self.grid.wind_direction[self.x, self.y, season] = direction.id if direction else 0
+            self.grid.wind_target[self.x, self.y, season] = wind.get('windward_hex').index
+            self.grid.wind_pressure_diff[self.x, self.y, season] = wind.get('pressure_diff')
+
+    @property
+    def wind_temp_effect(self):
+        """ Seasonal pair. Temp changes from pressure and wind """
+        return self.grid.wind_temp_effect[self.x, self.y]
+
+    @property
+    def territory(self):
+        territory_id = self.grid.territory_id[self.x, self.y]
+        if territory_id < 0:
+            return None
+        return self.grid.territories[territory_id]
+
+    @territory.setter
+    def territory(self, value):
+        if value is None:
+            self.grid.territory_id[self.x, self.y] = -1
+        else:
+            self.grid.territories[value.id] = value
+            self.grid.territory_id[self.x, self.y] = value.id
+
+    @property
+    def geoform_type(self):
+        return GEOFORM_TYPES.get(self.grid.geoform_type[self.x, self.y])
+
+    @geoform_type.setter
+    def geoform_type(self, value):
+        self.grid.geoform_type[self.x, self.y] = 0 if value is None else value.id
+
+    @property
+    def geoform(self):
+        """ geoform instance if it exists """
+        geoform_id = self.grid.geoform_id[self.x, self.y]
+        if geoform_id < 0:
+            return None
+        return self.grid.geoforms[geoform_id].find()
+
+    @geoform.setter
+    def geoform(self, value):
+        if value is None:
+            self.grid.geoform_id[self.x, self.y] = -1
+        else:
+            if value.index is None:
+                self.grid.register_geoform(value)
+            self.grid.geoform_id[self.x, self.y] = value.index
+
+    @property
+    def resource(self):
+        """ dict of the resource's HexResourceType and HexResourceRating, or None """
+        type_id = self.grid.resource_type[self.x, self.y]
+        if type_id == 0:
+            return None
+        return dict(rating=RESOURCE_RATINGS[self.grid.resource_rating[self.x, self.y]],
+                    type=RESOURCE_TYPES[type_id])
+
+    @resource.setter
+    def resource(self, value):
+        if value is None:
+            self.grid.resource_type[self.x, self.y] = 0
+            self.grid.resource_rating[self.x, self.y] = 0
+        else:
+            self.grid.resource_type[self.x, self.y] = value.get('type').id
+            self.grid.resource_rating[self.x, self.y] = value.get('rating').id
+
+    @property
+    def features(self):
+        mask = self.grid.features[self.x, self.y]
+        return set(f for f, bit in FEATURE_BITS.items() if mask & bit)
 
     def has_feature(self, feature):
         """
@@ -61,7 +176,7 @@ class Hex:
         :param feature: HexFeature
         :return:
         """
-        return feature in self.features
+        return bool(self.grid.features[self.x, self.y] & FEATURE_BITS[feature])
 
     def add_feature(self, feature):
         """
@@ -69,7 +184,8 @@ class Hex:
         :param feature: HexFeature
         :return: None
         """
-        self.features.add(feature)
+        self.grid.features[self.x, self.y] |= FEATURE_BITS[feature]
+        self.grid.invalidate_biomes()
 
     def remove_feature(self, feature):
         """
@@ -77,7 +193,11 @@ class Hex:
         :param feature: HexFeature
         :return: None
         """
-        self.features.remove(feature)
+        if not self.has_feature(feature):
+            raise KeyError(feature)
+        mask = int(self.grid.features[self.x, self.y])
+        self.grid.features[self.x, self.y] = mask & ~FEATURE_BITS[feature]
+        self.grid.invalidate_biomes()
 
     @property
     def is_owned(self):
@@ -154,158 +274,49 @@ class Hex:
 
     @property
     def latitude_ratio(self):
-        ratio = self.x / self.grid.size
-        if ratio < 0.5:
-            ratio /= 0.5
-        else:
-            ratio = (1 - ratio) / 0.5
-        return ratio
-
+        return float(self.grid.latitude_ratio[self.x])
 
     @property
     def hemisphere(self):
-        if self.x <= round(self.grid.size / 2):
+        if self.grid.northern[self.x]:
             return Hemisphere.northern
         return Hemisphere.southern
 
     @property
     def latitude(self):
         """ Hex's current Latitude. Negative is south, positive is north """
-        ratio = self.x / self.grid.size
-        if ratio < 0.5: # north
-            return (1 - ratio / 0.5) * 90
-        else: # south
-            return ((ratio ) / 0.5) * -90 + 90
+        return float(self.grid.latitude[self.x])
 
     @property
     def zone(self):
-        axial_tilt = abs(self.grid.params.get('axial_tilt'))
-
-        # northern polar zone
-        northern_polar_zone = 90 - axial_tilt
-        southern_polar_zone = -(90 - axial_tilt)
-        northern_tropic_zone = axial_tilt
-        southern_tropic_zone = -axial_tilt
-        northern_temperate = axial_tilt + (axial_tilt / 2)
-        southern_temperate = -(axial_tilt + (axial_tilt / 2))
-
-        if northern_polar_zone < self.latitude <= 90:
-            return Zones.arctic_circle
-        elif northern_temperate < self.latitude <= northern_polar_zone:
-            return Zones.northern_temperate
-        elif northern_tropic_zone < self.latitude <= northern_temperate:
-            return Zones.northern_subtropics
-        elif 0 < self.latitude <= northern_tropic_zone:
-            return Zones.northern_tropics
-        elif southern_tropic_zone < self.latitude <= 0:
-            return Zones.southern_tropics
-        elif southern_temperate < self.latitude <= southern_tropic_zone:
-            return Zones.southern_subtropics
-        elif southern_polar_zone < self.latitude <= southern_temperate:
-            return Zones.southern_temperate
-        elif -90 < self.latitude <= southern_polar_zone:
-            return Zones.antarctic_circle
+        return self.grid.zones[self.x]
 
     @property
     def base_temperature(self):
         """
-        Computes the temperature of this hex. Takes into account the latitude (x-coord) and
-        the altitude (higher is colder)
-        :return: number
+        The temperature of this hex from the latitude (x-coord) and the altitude (higher is colder)
+        :return: seasonal tuple
         """
-        # import ipdb; ipdb.set_trace()
-        ratio = self.latitude_ratio
-        avg_temp = self.grid.params.get('avg_temp')
-        volitility = round(abs(self.grid.params.get('axial_tilt')))
-        base_temp = self.grid.params.get('base_temp')
-        min_temp = max(avg_temp - volitility, base_temp)
-        # global avg temperature should be around ratio 0.4 and 0.6
-
-        # part1 includes latitude only
-        part1 = (abs(min_temp) + (avg_temp + volitility)) * ratio + min_temp
-        # return (part1, part1)
-        #print(base_temp, avg_temp, volitility, min_temp, ratio, part1)
-        #       43         73          16         57
-
-        # part2 includes altitude
-        factor = 7
-        if self.is_water:
-            factor = 8
-        part2 = abs(self.altitude - self.grid.sealevel) / factor
-        return (round(part1, 2) - round(part2, 2), round(part1, 2) - round(part2, 2))
+        base_temperature = float(self.grid.base_temperature[self.x, self.y])
+        return base_temperature, base_temperature
 
     @property
     def temperature(self):
-        return (
-            self.base_temperature[0] + self.wind_temp_effect[0],
-            self.base_temperature[1] + self.wind_temp_effect[1],
-        )
-
+        """ Seasonal tuple of the base temperature with wind effects """
+        end_year, mid_year = self.grid.temperature[self.x, self.y]
+        return float(end_year), float(mid_year)
 
     @property
     def biome(self):
         """
-        Computes the biome
+        The biome, from the grid's biome ids
         :return: Biome
         """
-        map_type = self.grid.params.get('map_type')
-        if map_type is MapType.barren: # barren
-            if self.grid.params.get('pressure') < 0.003: # trace atmosphere
-                return Biome.barren
-            else: # small atmosphere
-                # TODO: determine where to put ice caps based on atmospheric compounds
-                if self in self.grid.coldest_hexes and self.temperature < 0:
-                    return Biome.barren_ice_caps
-                elif self.moisture > 5 or self.has_feature(HexFeature.lake):
-                    return Biome.barren_wet
-                else:
-                    return Biome.barren_dusty
-
-        elif map_type is MapType.terran:
-            temp = self.temperature[0]
-            rain = self.moisture
-            if temp <= -10:
-                return Biome.arctic
-            elif 5 < rain and temp <= 0:
-                return Biome.alpine_tundra
-            elif 0 <= rain <= 5 and temp <= 0:
-                return Biome.tundra
-            elif 5 < rain and 0 < temp <= 7:
-                return Biome.boreal_forest
-            elif 0 <= rain <= 3.5 and 0 < temp <= 20:
-                return Biome.grasslands
-            elif 3.5 < rain <= 5 and 0 < temp <= 20:
-                return Biome.shrubland
-            elif 0 <= rain < 4 and 20 < temp:
-                return Biome.desert
-            elif 4 <= rain <= 8 and 20 < temp:
-                return Biome.shrubland
-            elif 5 < rain <= 10 and 7 < temp <= 20:
-                return Biome.savanna
-            elif 10 < rain <= 20 and 7 < temp <= 20:
-                return Biome.temperate_forest
-            elif 20 < rain and 7 < temp <= 20:
-                return Biome.temperate_rainforest
-            elif 8 < rain <= 20 and 20 < temp:
-                return Biome.tropical_forest
-            elif 20 < rain and 20 < temp:
-                return Biome.tropical_rainforest
-
-            raise Exception("Biome invalid Rainfall: {}, Temperature: {}".format(rain, temp))
-
-        elif map_type is MapType.volcanic:
-            if self.altitude < 60:
-                return Biome.volcanic_liquid
-            elif self.has_feature(HexFeature.lava_flow):
-                return Biome.volcanic_molten_river
-            else:
-                return Biome.volcanic_solid
-
-        return Biome.lifeless
+        return BIOMES[self.grid.biome_id[self.x, self.y]]
 
     @property
     def max_size(self):
-        return len(self.grid.grid) - 1
+        return self.grid.size - 1
 
     @property
     def map_surrounding(self):
@@ -313,123 +324,48 @@ class Hex:
         Returns the surrounding hexes without wrapping about the map
         :return: list of Hex
         """
-        # east
-        sur = []
-        if self.y != self.max_size:
-            sur.append(self.grid.find_hex(self.x, self.y + 1))
-        # west
-        if self.y != 0:
-            sur.append(self.grid.find_hex(self.x, self.y - 1))
-        # north west
-        if self.x != 0 and self.y != 0:
-            if self.x % 2 == 0:  # even
-                sur.append(self.grid.find_hex(self.x - 1, self.y - 1))
-            else:
-                sur.append(self.grid.find_hex(self.x - 1, self.y))
-        # north east
-        if self.x != 0 and self.y != self.max_size:
-            if self.x % 2 == 0:  # even
-                sur.append(self.grid.find_hex(self.x - 1, self.y))
-            else:
-                sur.append(self.grid.find_hex(self.x - 1, self.y + 1))
-        # south west
-        if self.x != self.max_size and self.y != 0:
-            if self.x % 2 == 0:  # even
-                sur.append(self.grid.find_hex(self.x + 1, self.y - 1))
-            else:
-                sur.append(self.grid.find_hex(self.x + 1, self.y))
-        # south east
-        if self.x != self.max_size and self.y != self.max_size:
-            if self.x % 2 == 0:  # even
-                sur.append(self.grid.find_hex(self.x + 1, self.y))
-            else:
-                sur.append(self.grid.find_hex(self.x + 1, self.y + 1))
-        return sur
+        row = self.grid.map_neighbor_table[self.index]
+        return [self.grid.hex_at_index(row[direction.id - 1]) for direction in MAP_SURROUNDING_EDGES
+                if row[direction.id - 1] >= 0]
 
+    def _neighbor(self, direction):
+        return self.grid.hex_at_index(self.grid.neighbor_table[self.index, direction.id - 1])
 
     @property
     def hex_east(self):
-        """ Returns the hex to the East or None if end of map"""
-        if self.y == self.max_size:
-            return self.grid.find_hex(self.x, 0)
-        else:
-            return self.grid.find_hex(self.x, self.y + 1)
+        """ Returns the hex to the East"""
+        return self._neighbor(HexEdge.east)
 
     @property
     def hex_west(self):
-        """ Returns the hex to the West or None if end of map"""
-        if self.y == 0:
-            return self.grid.find_hex(self.x, self.max_size)
-        else:
-            return self.grid.find_hex(self.x, self.y - 1)
+        """ Returns the hex to the West"""
+        return self._neighbor(HexEdge.west)
 
     @property
     def hex_north_west(self):
         """ Returns the hex to the north west"""
-        if self.x == 0:  # top of map
-            return self.grid.find_hex(0, round(self.y / -1 + self.max_size))
-        elif self.y == 0 and self.x % 2 == 0:  # left of map and even
-            return self.grid.find_hex(self.x - 1, self.max_size)
-        else:
-            if self.x % 2 == 0:  # even
-                return self.grid.find_hex(self.x - 1, self.y - 1)
-            else:
-                return self.grid.find_hex(self.x - 1, self.y)
+        return self._neighbor(HexEdge.north_west)
 
     @property
     def hex_north_east(self):
-        """ Returns the hex to the North East or None if end of map"""
-        if self.x == 0:  # top of map
-            return self.grid.find_hex(0, round(self.y / -1 + self.max_size))
-        elif self.y == self.max_size and self.x % 2 == 1:  # right of map and x is odd
-            return self.grid.find_hex(self.x - 1, 0)
-        else:
-            if self.x % 2 == 0:  # even
-                return self.grid.find_hex(self.x - 1, self.y)
-            else:
-                return self.grid.find_hex(self.x - 1, self.y + 1)
+        """ Returns the hex to the North East"""
+        return self._neighbor(HexEdge.north_east)
 
     @property
     def hex_south_west(self):
-        """ Returns the hex to the South West or None if end of map"""
-        if self.x == self.max_size:  # bottom of map
-            return self.grid.find_hex(self.max_size, round(self.y / -1 + self.max_size))
-        elif self.y == 0 and self.x % 2 == 1:  # left of map and x is odd
-            return self.grid.find_hex(self.x - 1, self.max_size)
-        else:
-            if self.x % 2 == 0:  # even
-                return self.grid.find_hex(self.x + 1, self.y - 1)
-            else:
-                return self.grid.find_hex(self.x + 1, self.y)
+        """ Returns the hex to the South West"""
+        return self._neighbor(HexEdge.south_west)
 
     @property
     def hex_south_east(self):
-        """ Returns the hex to the South East or None if end of map"""
-        if self.x == self.max_size:  # bottom of map
-            return self.grid.find_hex(self.max_size, round(self.y / -1 + self.max_size))
-        elif self.y == self.max_size and self.x % 2 == 1:  # right of map and x is odd
-            return self.grid.find_hex(self.x + 1, 0)
-        else:
-            if self.x % 2 == 0:  # even
-                return self.grid.find_hex(self.x + 1, self.y)
-            else:
-                return self.grid.find_hex(self.x + 1, self.y + 1)
+        """ Returns the hex to the South East"""
+        return self._neighbor(HexEdge.south_east)
 
     def neighbor_at(self, direction):
         """ Given a HexEdge, find the hex on the other side of this edge """
-        if direction is HexEdge.east:
-            return self.hex_east
-        elif direction is HexEdge.south_east:
-            return self.hex_south_east
-        elif direction is HexEdge.south_west:
-            return self.hex_south_west
-        elif direction is HexEdge.west:
-            return self.hex_west
-        elif direction is HexEdge.north_west:
-            return self.hex_north_west
-        elif direction is HexEdge.north_east:
-            return self.hex_north_east
-        raise Exception("No such direction")
+        if not isinstance(direction, HexEdge):
+            raise Exception("No such direction")
+        return self._neighbor(direction)
 
     @property
     def surrounding(self):
@@ -437,49 +373,22 @@ class Hex:
          Returns a list of all surrounding hexes
          Returns: Hex
         """
-        return [self.hex_east, self.hex_south_east, self.hex_south_west,
-                self.hex_west, self.hex_north_west, self.hex_north_east]
+        row = self.grid.neighbor_table[self.index]
+        return [self.grid.hex_at_index(row[direction.id - 1]) for direction in SURROUNDING_EDGES]
 
     @property
     def neighbors(self):
         """ Surrounding hexes with HexEdge enums """
-        if self._neighbors is not None:
-            return self._neighbors
-        else:
-            self._neighbors = [
-                (HexEdge.east, self.hex_east),
-                (HexEdge.south_east, self.hex_south_east),
-                (HexEdge.south_west, self.hex_south_west),
-                (HexEdge.west, self.hex_west),
-                (HexEdge.north_west, self.hex_north_west),
-                (HexEdge.north_east, self.hex_north_east),
-            ]
-            return self._neighbors
+        row = self.grid.neighbor_table[self.index]
+        return [(direction, self.grid.hex_at_index(row[direction.id - 1]))
+                for direction in SURROUNDING_EDGES]
 
     def bubble(self, distance=1):
         """
-         Returns a list of all hexes within a certain number of hexes
+         Returns a list of all hexes within a certain number of hexes, this one included
         """
-        around = self.surrounding
-        if distance == 0:
-            return self
-        elif distance == 1:
-            return around.append(self)
-        try:
-            return self.bubble_cache[distance]
-        except KeyError:
-            def step(iteration, hexes):
-                if iteration < distance - 1:
-                    temp = []
-                    for h in hexes:
-                        temp.extend(h.surrounding)
-                    return step(iteration + 1, temp)
-                else:
-                    return hexes
-            around.extend(step(0, around))
-            final = list(set(around))
-            self.bubble_cache[distance] = final
-            return final
+        indexes = self.grid.neighborhood.around(self.index, distance)
+        return [self.grid.hex_at_index(i) for i in indexes]
 
 
     @property
@@ -514,12 +423,6 @@ class Hex:
     def is_coast(self):
         return any(x.is_land for x in self.surrounding)
 
-    def decide_slope(self, one, two):
-        """ Returns UP, DOWN tuple """
-        if one.altitude < two.altitude:
-            return two, one
-        return one, two
-
     def __eq__(self, other):
         return self.x == other.x and self.y == other.y
 
@@ -535,51 +438,32 @@ class Hex:
                 self.hex_west.edge_south_east, self.hex_south_west.edge_east,
                 self.hex_south_east.edge_north_east, self.hex_east.edge_north_west]
 
-    def calculate(self):
-        """ Calculate the edges """
-        h1 = self.hex_north_east
-        h2 = self.hex_south_east
-        up, down = self.decide_slope(h1, h2)
-        self.edge_east = Edge(HexSide.east, self, self.hex_east, up, down)
-
-        h1 = self.hex_north_west
-        h2 = self.hex_south_west
-        up, down = self.decide_slope(h1, h2)
-        self.edge_west = Edge(HexSide.west, self, self.hex_west, up, down)
-
-        h1 = self.hex_north_west
-        h2 = self.hex_east
-        up, down = self.decide_slope(h1, h2)
-        self.edge_north_east = Edge(HexSide.north_east, self, self.hex_north_east, up, down)
-
-        h1 = self.hex_south_west
-        h2 = self.hex_east
-        up, down = self.decide_slope(h1, h2)
-        self.edge_south_east = Edge(HexSide.south_east, self, self.hex_south_east, up, down)
-
-        h1 = self.hex_north_east
-        h2 = self.hex_west
-        up, down = self.decide_slope(h1, h2)
-        self.edge_north_west = Edge(HexSide.north_west, self, self.hex_north_west, up, down)
-
-        h1 = self.hex_south_east
-        h2 = self.hex_west
-        up, down = self.decide_slope(h1, h2)
-        self.edge_south_west = Edge(HexSide.south_west, self, self.hex_south_west, up, down)
-
     def get_edge(self, side):
-        if side is HexSide.east:
-            return self.edge_east
-        elif side is HexSide.south_east:
-            return self.edge_south_east
-        elif side is HexSide.south_west:
-            return self.edge_south_west
-        elif side is HexSide.west:
-            return self.edge_west
-        elif side is HexSide.north_west:
-            return self.edge_north_west
-        elif side is HexSide.north_east:
-            return self.edge_north_east
+        return self.grid.get_edge(self, side)
+
+    @property
+    def edge_east(self):
+        return self.get_edge(HexSide.east)
+
+    @property
+    def edge_west(self):
+        return self.get_edge(HexSide.west)
+
+    @property
+    def edge_north_east(self):
+        return self.get_edge(HexSide.north_east)
+
+    @property
+    def edge_south_east(self):
+        return self.get_edge(HexSide.south_east)
+
+    @property
+    def edge_north_west(self):
+        return self.get_edge(HexSide.north_west)
+
+    @property
+    def edge_south_west(self):
+        return self.get_edge(HexSide.south_west)
 
     @property
     def edges(self):
@@ -744,5 +628,3 @@ class Hex:
         end_year = round((self.pressure[0] - self.grid.params.get('surface_pressure'))) * 5
         mid_year = round((self.pressure[1] - self.grid.params.get('surface_pressure'))) * 5
         return ((100 + end_year, 100, 100), (100 + mid_year, 100, 100))
-
-from hexgen.edge import Edge
@@ -1,20 +1,21 @@
 import uuid
 import copy
 import json
-import math
 import random
 import sys
 sys.setrecursionlimit(10000)
+import numpy as np
 
 from hexgen.constants import *
-from hexgen.territory import Territory
-from hexgen.enums import OceanType, HexResourceType, HexResourceRating, MapType, Hemisphere, GeoformType
-from hexgen.geoform import Geoform
+from hexgen.territory import Territory, find_groups
+from hexgen.enums import OceanType, HexResourceType, HexResourceRating, MapType, GeoformType
+from hexgen.geoform import Geoform, link_geoforms, resolve_geoforms
 from hexgen.heightmap import Heightmap
 from hexgen.grid import Grid
+from hexgen.hex import FEATURE_BITS
 from hexgen.calendar import Calendar
-from hexgen.util import decide_wind, pressure_at_seasons, Timer, is_isthmus, \
-                        is_bay, is_strait, first_hex_without_geoform, is_peninsula
+from hexgen.util import wind_field, pressure_at_seasons, Timer, is_isthmus, \
+                        is_bay, is_strait, is_peninsula
 
 default_params = {
     "map_type": MapType.terran,
@@ -29,18 +30,27 @@ default_params = {
     "ocean_type": OceanType.water,
     "random_seed": None,
     "roughness": 8,
+    "heightmap_engine": "recursive", # "recursive" or "iterative" (numpy, for large maps)
     "height_range": (0, 255),
     "pressure": 1, # bar
     "axial_tilt": 23,
+    "wind_iterations": 20, # steps the wind carries temperature downwind
+    "wind_rate": 0.1, # share of the temperature difference the wind carries each step
 
     # features
     "craters": False,
     "volanoes": False,
 
     "num_rivers": 50,
+    "river_workers": 1, # processes tracing rivers, None for one per CPU
 
     # territories
     "num_territories": 0,
+    "territory_growth_chance": 1.0, # chance of a territory growing into a free hex each round
+
+    # exporting
+    "draw_engine": "vector", # "vector" or "raster" (numpy, for large maps)
+    "draw_workers": 1, # processes drawing map images, None for one per CPU
 
 }
 
@@ -64,6 +74,7 @@ class MapGen:
 
         if type(params.get('random_seed')) is int:
             random.seed(params.get('random_seed'))
+        self.rng = np.random.default_rng(self.params.get('random_seed'))
 
         with Timer("Building Heightmap", self.debug):
             self.heightmap = Heightmap(self.params, self.debug)
@@ -79,6 +90,7 @@ class MapGen:
 
         self.rivers = []
         self.rivers_sources = []
+        self.river_index = RiverIndex(self.hex_grid.size, self.rivers)
 
         with Timer("Computing hex distances", self.debug):
             self._get_distances()
@@ -86,52 +98,10 @@ class MapGen:
         self._generate_pressure()
 
 
+        river_counts = None
         if self.params.get('hydrosphere'):
-            self._generate_rivers()
-
-            # give coastal land hexes moisture based on how close to the coast they are
-            # TODO: replace with more realistic model
-            print("Making coastal moisture") if self.debug else False
-            for y, row in enumerate(self.hex_grid.grid):
-                for x, col in enumerate(row):
-                    hex = self.hex_grid.grid[x][y]
-                    if hex.is_land:
-                        if hex.distance <= 5:
-                            hex.moisture += 1
-                        if hex.distance <= 3:
-                            hex.moisture += random.randint(1, 3)
-                        if hex.distance <= 1:
-                            hex.moisture += random.randint(1, 6)
-
-        # generate aquifers
-        num_aquifers = random.randint(5, 25)
-
-        if self.params.get('hydrosphere') is False or self.params.get('sea_percent') == 100:
-            num_aquifers = 0
-
-        print("Making {} aquifers".format(num_aquifers)) if self.debug else False
-        aquifers = []
-        while len(aquifers) < num_aquifers:
-            rx = random.randint(0, len(self.hex_grid.grid) - 1)
-            ry = random.randint(0, len(self.hex_grid.grid) - 1)
-            hex = self.hex_grid.grid[rx][ry]
-            if hex.is_land and hex.moisture < 5:
-                aquifers.append(hex)
-
-        for hex in aquifers:
-            # print("Aquifer at ", hex)
-            r1 = hex.bubble(distance=3)
-            for hex in r1:
-                if hex.is_land:
-                    hex.moisture += random.randint(0, 2)
-            r2 = hex.bubble(distance=2)
-            for hex in r2:
-                if hex.is_land:
-                    hex.moisture += 1
-            r3 = hex.surrounding
-            for hex in r3:
-                if hex.is_land:
-                    hex.moisture += 1
+            river_counts = self._generate_rivers()
+        self._generate_moisture(river_counts)
 
         # decide terrain features
         print("Making terrain features") if self.debug else False
@@ -149,38 +119,30 @@ class MapGen:
                                     size=size,
                                     depth= 10 * size))
 
+            grid = self.hex_grid
+            flat_altitude = grid.altitude.ravel()
+            flat_features = grid.features.ravel()
+            crater_bit = FEATURE_BITS[HexFeature.crater]
             for crater in craters:
 
-                center_hex = crater.get('hex')
+                center = crater.get('hex').index
                 size = crater.get('size')
                 depth = crater.get('depth')
+                center_altitude = flat_altitude[center]
                 hexes = []
 
-                if size >= 1:
-                    hexes = center_hex.surrounding
-                    for h in hexes:
-                        h.add_feature(HexFeature.crater)
-                        h.altitude = center_hex.altitude - 5
-                        h.altitude = max(h.altitude, 0)
-                if size >= 2:
-                    hexes = center_hex.bubble(distance=2)
-                    for h in hexes:
-                        h.add_feature(HexFeature.crater)
-                        h.altitude = center_hex.altitude - 10
-                        h.altitude = max(h.altitude, 0)
-
-                if size >= 3:
-                    hexes = center_hex.bubble(distance=3)
-                    for h in hexes:
-                        h.add_feature(HexFeature.crater)
-                        h.altitude = center_hex.altitude - 15
-                        h.altitude = max(h.altitude, 0)
-                for h in hexes[:round(len(hexes)/3)]:
-                    for i in h.surrounding:
-                        if i.has_feature(HexFeature.crater) is False:
-                            i.add_feature(HexFeature.crater)
-                            i.altitude = center_hex.altitude - 20
-                            i.altitude = max(i.altitude, 0)
+                for radius in range(1, size + 1):
+                    if radius == 1:
+                        hexes = grid.neighbor_table[center]
+                    else:
+                        hexes = grid.neighborhood.around(center, radius)
+                    flat_features[hexes] |= crater_bit
+                    flat_altitude[hexes] = max(center_altitude - 5 * radius, 0)
+                rim = np.unique(grid.neighbor_table[hexes[:round(len(hexes) / 3)]])
+                rim = rim[flat_features[rim] & crater_bit == 0]
+                flat_features[rim] |= crater_bit
+                flat_altitude[rim] = max(center_altitude - 20, 0)
+            grid.invalidate_altitude()
 
 
         # volcanoes
@@ -196,35 +158,32 @@ class MapGen:
                     height = random.randint(30, 70)
                     volcanoes.append(dict(hex=center_hex, size=size, height=height))
 
+            grid = self.hex_grid
+            flat_altitude = grid.altitude.ravel()
+            flat_features = grid.features.ravel()
+            volcano_bit = FEATURE_BITS[HexFeature.volcano]
             for volcano in volcanoes:
                 height = volcano.get('height')
                 size = volcano.get('size')
                 center_hex = volcano.get('hex')
+                center = center_hex.index
+                center_altitude = flat_altitude[center]
                 print("\tVolcano: Size: {}, Height: {}".format(size, height))
-                size_list = list(range(size))
-                size_list.reverse()
                 hexes = []
-                for i in size_list:
-                    i += 1
-                    this_height = round(height / i)
-                    if i == 1:
-                        l = center_hex.surrounding + [center_hex]
-                    else:
-                        l = center_hex.bubble(distance=i)
-                    for h in l:
-                        hexes.append(h)
-                        h.altitude = center_hex.altitude + this_height
-                        h.add_feature(HexFeature.volcano)
-
-                last_altitude = 0
-                for h in hexes[:round(len(hexes)/2)]:
-                    for i in h.surrounding:
-                        if i.has_feature(HexFeature.volcano) is False:
-                            i.add_feature(HexFeature.volcano)
-                            i.altitude += 5
-                            i.altitude = min(i.altitude, 255)
-                            last_altitude = i.altitude
-                center_hex.altitude += last_altitude + 5
+                for i in range(size, 0, -1):
+                    l = grid.neighborhood.around(center, i)
+                    hexes.append(l)
+                    flat_altitude[l] = center_altitude + round(height / i)
+                    flat_features[l] |= volcano_bit
+                hexes = np.concatenate(hexes)
+
+                rim = np.unique(grid.neighbor_table[hexes[:round(len(hexes) / 2)]])
+                rim = rim[flat_features[rim] & volcano_bit == 0]
+                flat_features[rim] |= volcano_bit
+                flat_altitude[rim] = np.minimum(flat_altitude[rim] + 5, 255)
+                last_altitude = flat_altitude[rim[-1]] if len(rim) else 0
+                flat_altitude[center] += last_altitude + 5
+                grid.invalidate_altitude()
 
                 # lava flow
                 def step(active_hex):
@@ -253,23 +212,21 @@ class MapGen:
         print("Done") if self.debug else False
 
     def generate_resources(self):
+        """
+        Places resources. Every hex has a chance at each rating and type of resource, and
+        the last one it gets is kept. The hexes that get each one are drawn all at once
+        """
         print("Placing resources")
-        ratings = HexResourceRating.list()
-        types = HexResourceType.list()
-
-        combined = []
-
-        for r in ratings:
-            for t in types:
-                combined.append(dict(rating=r,
-                                     type=t))
-        for h in self.hex_grid.hexes:
-            for resource in combined:
-                chance = (resource.get('rating').rarity *
-                          resource.get('type').rarity * self.hex_grid.size / 1000 ) / (math.pow(self.hex_grid.size, 2))
-                given = random.uniform(0, 1)
-                if given <= chance:
-                    h.resource = resource
+        grid = self.hex_grid
+        count = grid.size * grid.size
+        resource_type = grid.resource_type.ravel()
+        resource_rating = grid.resource_rating.ravel()
+        for r in HexResourceRating.list():
+            for t in HexResourceType.list():
+                chance = (r.rarity * t.rarity * grid.size / 1000) / (grid.size ** 2)
+                hits = self.rng.choice(count, self.rng.binomial(count, min(chance, 1)), replace=False)
+                resource_type[hits] = t.id
+                resource_rating[hits] = r.id
 
     def generate_territories(self):
         """
@@ -282,225 +239,110 @@ class MapGen:
         # give each a land pixel to start
         print("Making {} territories".format(num_territories)) if self.debug else False
 
-        c = 0
         if num_territories == 0:
             return
-        while len(self.territories) < num_territories:
-            rx = random.randint(0, len(self.hex_grid.grid) - 1)
-            ry = random.randint(0, len(self.hex_grid.grid) - 1)
-            hex_s = self.hex_grid.grid[rx][ry]
-            if hex_s.is_land:
-                color = random.randint(0, 255), random.randint(0, 255), random.randint(0, 255)
-                self.territories.append(Territory(self.hex_grid, hex_s, c, color))
-                c += 1
-
-        # loop over each, adding hexes
-        total_hexes = self.hex_grid.size * self.hex_grid.size
-        count = 0
-        while count < total_hexes:  #  i in range(0, 15):
-            count = 0
-            # print("Start: {} < {}".format(count, total_hexes))
-            territories = self.territories
-            random.shuffle(territories)
-            for t in territories:
-                frontier = t.frontier
-                for f in frontier:
-                    if f.is_owned is False:
-                        f.territory = t
-                        t.members.append(f)
-                        t.last_added.append(f)
-                count += t.size
-            # print("End: {} < {}".format(count, total_hexes))
-
-        # remove water hexes
-        for t in self.territories:
-            members = t.members
-            t.members = [h for h in t.members if h.is_land]
-            water_hexes = (h for h in members if h.is_water)
-            for h in water_hexes:
-                h.territory = None
+        grid = self.hex_grid
+        land = grid.land
+        land_hexes = np.flatnonzero(land)
+        num_territories = min(num_territories, len(land_hexes))
+        seeds = self.rng.choice(land_hexes, size=num_territories, replace=False)
+        colors = self.rng.integers(0, 256, size=(num_territories, 3))
+        for c, (seed, color) in enumerate(zip(seeds, colors)):
+            self.territories.append(Territory(grid, grid.hex_at_index(seed), c, tuple(int(i) for i in color)))
+
+        # grow every territory at once until the map is full, then remove water hexes
+        territory_id = grid.grow_regions(seeds, rng=self.rng,
+                                         chance=self.params.get('territory_growth_chance'))
+        territory_id[~land] = -1
+        grid.territory_id[:] = territory_id
 
         # merge territories
         print("Merging barren territories")
 
-        if self.params.get('num_territories') > 0:
-            top = []
-            bottom = []
-            for t in self.territories:
-                avg_x = round(sum([i.x for i in t.members]) / len(t.members))
-                if t.avg_temp < 0 and (avg_x / self.hex_grid.size) < 0.5:
-                    top.append(t)
-                elif t.avg_temp < 0 and (avg_x / self.hex_grid.size) >= 0.5:
-                    bottom.append(t)
-
-            pick_top = None
-            pick_bottom = None
-            if len(top) > 0:
-                print("Merging {} territories from the top of the map".format( len(top) ))
-                pick_top = random.choice(top)
-                top.remove(pick_top)
-                for t in self.territories:
-                    if t in top:
-                        pick_top.members += t.members
-                        t.members = []
-
-            if len(bottom) > 0:
-                print("Merging {} territories from the bottom of the map".format( len(bottom) ))
-                pick_bottom = random.choice(bottom)
-                bottom.remove(pick_bottom)
-                for t in self.territories:
-                    if t in bottom:
-                        pick_bottom.members += t.members
-                        t.members = []
-
-            if len(top) > 0:
-                for h in pick_top.members:
-                    h.territory = pick_top
-
-            if len(bottom) > 0:
-                for h in pick_bottom.members:
-                    h.territory = pick_bottom
-
-            self.territories = [t for t in self.territories if t is not None]
-
-            print("{} empty territories being deleted".format(len([t for t in self.territories if len(t.members) == 0])))
-            self.territories = [t for t in self.territories if len(t.members) > 0]
-
-            print("There are now {} territories".format(len(self.territories)))
+        top = []
+        bottom = []
+        for t in self.territories:
+            avg_x = round(float(np.mean(t.indexes // grid.size)))
+            if t.avg_temp < 0 and (avg_x / grid.size) < 0.5:
+                top.append(t)
+            elif t.avg_temp < 0 and (avg_x / grid.size) >= 0.5:
+                bottom.append(t)
+
+        for barren, side in ((top, "top"), (bottom, "bottom")):
+            if len(barren) > 0:
+                print("Merging {} territories from the {} of the map".format(len(barren), side))
+                pick = barren[self.rng.integers(len(barren))]
+                merged = np.isin(grid.territory_id, [t.id for t in barren])
+                grid.territory_id[merged] = pick.id
+
+        sizes = np.bincount(grid.territory_id[grid.territory_id >= 0], minlength=len(self.territories))
+        print("{} empty territories being deleted".format(int(np.count_nonzero(sizes == 0))))
+        self.territories = [t for t in self.territories if sizes[t.id] > 0]
+        grid.territories = dict((t.id, t) for t in self.territories)
+
+        print("There are now {} territories".format(len(self.territories)))
 
         print("Splitting territories into contiguous blocks") if self.debug else False
-        for t in self.territories:
-            t.find_groups()
+        find_groups(self.hex_grid, self.territories)
 
     def _get_distances(self):
         """
         Gets the distances each land pixel is to the coastline.
-        TODO: Make this more efficient
         """
 
         if not self.params.get('hydrosphere'):
             # we don't care about distances otherwise
             return
 
-        for y, row in enumerate(self.hex_grid.grid):
-            for x, col in enumerate(row):
-                h = self.hex_grid.grid[x][y]
-                if h.is_land:
-                    count = 1
-                    numbers = []
-
-                    east = h.hex_east
-                    while east.is_land is True and count < self.hex_grid.size * 2:
-                        east = east.hex_east
-                        count += 1
-                    numbers.append(count)
-                    count = 1
-
-                    west = h.hex_west
-                    while west.is_land is True and count < self.hex_grid.size * 2:
-                        west = west.hex_west
-                        count += 1
-                    numbers.append(count)
-                    count = 1
-
-
-                    north_east = h.hex_north_east
-                    while north_east.is_land is True and count < self.hex_grid.size * 2:
-                        north_east = north_east.hex_north_east
-                        count += 1
-                    numbers.append(count)
-                    count = 1
-
-
-                    north_west = h.hex_north_west
-                    while north_west.is_land is True and count < self.hex_grid.size * 2:
-                        north_west = north_west.hex_north_west
-                        count += 1
-
-                    numbers.append(count)
-                    count = 1
-
-
-                    south_west = h.hex_south_west
-                    while south_west.is_land is True and count < self.hex_grid.size * 2:
-                        south_west = south_west.hex_south_west
-                        count += 1
-                    numbers.append(count)
-                    count = 1
-
-                    south_east = h.hex_south_east
-                    while south_east.is_land is True and count < self.hex_grid.size * 2:
-                        south_east = south_east.hex_south_east
-                        count += 1
-                    numbers.append(count)
-
-                    h.distance = min(numbers)
+        distance = self.hex_grid.distance_field(~self.hex_grid.land)
+        # a world without water
+        distance[distance < 0] = self.hex_grid.size * 2
+        self.hex_grid.distance[:] = distance
 
     def _generate_pressure(self):
 
         with Timer("Generating pressure", self.debug):
             base_pressure = self.hex_grid.params.get('surface_pressure')
 
+            grid = self.hex_grid
+            size = grid.size
+            land = grid.land
+            latitude = grid.latitude[:, np.newaxis]
+
             with Timer("    calculating pressure zones", self.debug):
                 # calcualte pressure caused by pressure zones
-                pressure_diff = random.randint(3, 5)
-                for y, row in enumerate(self.hex_grid.grid):
-                    for x, col in enumerate(row):
-                        h = self.hex_grid.grid[x][y]
-
-                        # end_year is winter, mid_year is summer
-                        if h.is_land:
-                            max_shift = round(h.distance / 2)
-                            end_year = pressure_at_seasons(h.latitude, base_pressure, pressure_diff, -max_shift)
-                            mid_year = pressure_at_seasons(h.latitude, base_pressure, pressure_diff, max_shift)
-                        else:
-                            max_shift = min(6, 0.005 * round(self.hex_grid.sealevel - h.latitude))
-                            end_year = pressure_at_seasons(h.latitude, base_pressure, pressure_diff, -max_shift)
-                            mid_year = pressure_at_seasons(h.latitude, base_pressure, pressure_diff, max_shift)
-                        h.pressure = (end_year, mid_year)
+                pressure_diff = int(self.rng.integers(3, 6))
+                # end_year is winter, mid_year is summer
+                max_shift = np.where(land, np.rint(grid.distance / 2),
+                                     np.minimum(6, 0.005 * np.rint(grid.sealevel - latitude)))
+                grid.pressure[:, :, 0] = pressure_at_seasons(latitude, base_pressure, pressure_diff,
+                                                             -max_shift, self.rng)
+                grid.pressure[:, :, 1] = pressure_at_seasons(latitude, base_pressure, pressure_diff,
+                                                             max_shift, self.rng)
 
             # sort all hexes by land and water, lowest to highest
             with Timer("    sorting hexes into groups", self.debug):
-                land_hexes = [h for h in self.hex_grid.hexes if h.is_land]
-                water_hexes = [h for h in self.hex_grid.hexes if not h.is_land]
-                land_hexes.sort(key=lambda x: x.altitude, reverse=True)
-                water_hexes.sort(key=lambda x: x.altitude)
-
-            def decide_change(h, incr):
-                if h.is_land:
-                    if h.hemisphere is Hemisphere.northern:
-                        # winter / increase
-                        # summer / decrease
-                        return (h.pressure[0] + incr, h.pressure[1] - incr)
-                    elif h.hemisphere is Hemisphere.southern:
-                        # winter / decrease
-                        # summer / increase
-                        return (h.pressure[0] - incr, h.pressure[1] + incr)
-                else:
-                    if h.hemisphere is Hemisphere.northern:
-                        # winter / decrease
-                        # summer / increase
-                        return (h.pressure[0] - incr, h.pressure[1] + incr)
-                    elif h.hemisphere is Hemisphere.southern:
-                        # winter / increase
-                        # summer / decrease
-                        return (h.pressure[0] + incr, h.pressure[1] - incr)
-                    # return (h.pressure[0], h.pressure[1])
-
-            def brush(percent, incr):
-                matching_land_hexes = land_hexes[0:round(len(land_hexes) * percent)]
-                matching_water_hexes = water_hexes[0:round(len(water_hexes) * percent)]
-
-                for h in matching_land_hexes:
-                    for h in h.bubble(3):
-                        h.pressure = decide_change(h, incr * h.zone.incr)
-                for h in matching_water_hexes:
-                    for h in h.bubble(3):
-                        h.pressure = decide_change(h, incr * h.zone.incr)
-
-            brush(0.80, 0.05)
-            brush(0.30, 0.10)
-            brush(0.10, 0.10)
+                order = grid.temperature_order
+                flat_land = land.ravel()
+                altitude = grid.altitude.ravel()
+                land_hexes = order[flat_land[order]]
+                water_hexes = order[~flat_land[order]]
+                land_hexes = land_hexes[np.argsort(-altitude[land_hexes], kind='stable')]
+                water_hexes = water_hexes[np.argsort(altitude[water_hexes], kind='stable')]
+
+            # each brush pass changes the pressure of every hex within 3 hexes of the
+            # highest land and lowest water hexes, so the passes add up to one weighted sum
+            brushed = np.zeros(size * size)
+            for percent, incr in ((0.80, 0.05), (0.30, 0.10), (0.10, 0.10)):
+                brushed[land_hexes[0:round(len(land_hexes) * percent)]] += incr
+                brushed[water_hexes[0:round(len(water_hexes) * percent)]] += incr
+            change = grid.ball_sum(brushed.reshape(size, size), 3) * grid.zone_incr[:, np.newaxis]
+
+            # land in the north and water in the south increase in winter and decrease in summer,
+            # the others the other way around
+            change = np.where(land == grid.northern[:, np.newaxis], change, -change)
+            grid.pressure[:, :, 0] += change
+            grid.pressure[:, :, 1] -= change
 
         # decide wind directions
         # Wind consists of a HexEdge direction and a magnitude that is equal to the difference in pressure
@@ -513,60 +355,19 @@ class MapGen:
         #     high pressure areas: counter-clockwise
         #     low pressure areas: clockwise
         with Timer("Generating wind", self.debug):
-            for y, row in enumerate(self.hex_grid.grid):
-                for x, col in enumerate(row):
-                    h = self.hex_grid.grid[x][y]
-                    h.wind = (
-                        decide_wind(0, base_pressure, h),
-                        decide_wind(1, base_pressure, h)
-                    )
-
-        # IDEA 1
-        # If hex is warmer than downstream: increase temperature downstream 20 hexes
-        # If hex is colder than downstream: decrease temperature downstream 20 hexes
-        # downstream hexes are neighboring hexes that have lower pressure
-        # magnitude depends on pressure difference
-        # Visit each hex. Steps: N*N*20 where N is map size
-
-        # IDEA 2
-        # going downstream, bring each hex's temperature close to the starting hex's temperature
-        # less and less each loop, with loop 1 being very close and loop 20 being barely changed
-
-        # IDEA 3
-        # Visiting every hex, start a loop downstream until you reach a hex you have already visited
-        # in this loop, averaging every hex's temperature with the last visited hex's temperature
-        # weighted average favoring hex's base temperature when wind is less strong
-        def windgust(season_index, starting_hex, loops=20):
-            downstream_hex = starting_hex.wind[season_index].get('windward_hex')
-            temp_change = ((20 / (loops + 1)) / 20) * 10
-            if starting_hex.base_temperature[season_index] > downstream_hex.base_temperature[season_index]:
-                # increase temperature at downstream hex
-                downstream_hex.wind_temp_effect[season_index] = temp_change / 2
-                # decrease temperature at this hex
-                starting_hex.wind_temp_effect[season_index] = -(temp_change / 2)
-            else:
-                # decrease temperature at downstream hex
-                downstream_hex.wind_temp_effect[season_index] = -(temp_change / 2)
-                # increase temperature at this hex
-                starting_hex.wind_temp_effect[season_index] = temp_change / 2
-
-            # go on to the next hex in line
-            if loops != 0:
-                next_hex = downstream_hex.wind[season_index].get('windward_hex')
-                windgust(season_index, next_hex, loops - 1)
-
+            direction, windward, pressure_diff = wind_field(self.hex_grid, base_pressure)
+            self.hex_grid.wind_direction[:] = direction
+            self.hex_grid.wind_target[:] = windward
+            self.hex_grid.wind_pressure_diff[:] = pressure_diff
 
+        # If a hex is warmer than its windward hex, the wind warms the windward hex and cools this one,
+        # and the other way around if it is colder. Every hex trades at once, so the order doesn't matter
         with Timer("Generating Temperature Changes", self.debug):
-            for y, row in enumerate(self.hex_grid.grid):
-                for x, col in enumerate(row):
-                    h = self.hex_grid.grid[x][y]
-
-                    # end year
-                    windgust(0, h)
-
-                    # mid year
-                    windgust(1, h)
-
+            base = self.hex_grid.base_temperature[:, :, np.newaxis].repeat(2, axis=2)
+            temperature = self.hex_grid.advect(base, self.params.get('wind_iterations'),
+                                               self.params.get('wind_rate'))
+            self.hex_grid.wind_temp_effect[:] = temperature - base
+            self.hex_grid.invalidate_temperature()
 
     def _generate_rivers(self):
         """
@@ -587,6 +388,9 @@ class MapGen:
                 Make a lake at the lowest of the "one" or "two" hexes of this edge
                 Make a new river source edge at an random edge pointing out from this lake
                     that has a direction pointing out from the lake
+
+        :return: array of shape (size, size, 6), the number of river segments along each edge,
+                 kept at the edge's one hex in the column of its side
         """
         land_percent = 100 - self.params.get('sea_percent')
         num_rivers = self.params.get('num_rivers')
@@ -607,112 +411,26 @@ class MapGen:
 
         print("Placed river sources") if self.debug else False
 
-        for r in self.rivers_sources: # loop over each source segment
-            segment = r # river segment we are looking at
-            finished = False
-            last_unselected = None
-            # we stop only when one of two things happen:
-            #   - a lake is formed
-            #   - we reached sea level
-            while finished is False:
-                # print("Segment: {}, {}".format(segment.x, segment.y))
-                side_one, side_two = segment.side.branching(segment.edge.direction)
-                down = segment.edge.down  # down-slope hex of this segment
-
-                # add the moisture to the one and two hexes in a 3 radius
-                one = segment.edge.one.bubble(distance=3)
-                two = segment.edge.two.bubble(distance=3)
-                both = list(set(one + two))
-                for hex in both:
-                    if hex.is_land:
-                        hex.moisture += 1
-                three = segment.edge.one.surrounding
-                four = segment.edge.two.surrounding
-                both = list(set(three + four))
-                for hex in both:
-                    if hex.is_land:
-                        hex.moisture += 1
-
-                # find the two Edges from the sides found branching
-                edge_one = down.get_edge(side_one)
-                edge_two = down.get_edge(side_two)
-
-                # check if either of the edges are valid river segment locations
-                one_valid = True
-                two_valid = True
-                if edge_one.down == segment.edge.one or edge_one.down == segment.edge.two:
-                    one_valid = False
-                if edge_two.down == segment.edge.one or edge_two.down == segment.edge.two:
-                    two_valid = False
-
-                if self.is_river(edge_one):
-                    one_valid = False
-                elif self.is_river(edge_two):
-                    two_valid = False
-
-                if one_valid and two_valid:
-                    # print("\tBoth are valid edges")
-                    if edge_one.down.altitude < edge_two.down.altitude:
-                        selected = edge_one
-                        selected_side = side_one
-                        last_unselected = edge_two, side_two
-                    else:
-                        selected = edge_two
-                        selected_side = side_two
-                        last_unselected = edge_one, side_one
-                    if selected.down.altitude < self.hex_grid.sealevel:
-                        finished = True
-                    segment.next = RiverSegment(self.hex_grid, selected.one.x, selected.one.y, selected_side, False)
-                    segment = segment.next
-                elif one_valid is True and two_valid is False:
-                    # print("\tOne is Valid")
-                    selected = edge_one
-                    last_unselected = edge_two, side_two
-                    if selected.down.altitude < self.hex_grid.sealevel:
-                        finished = True
-                    segment.next = RiverSegment(self.hex_grid, selected.one.x, selected.one.y, side_one, False)
-                    segment = segment.next
-                elif one_valid is False and two_valid is True:
-                    # print("\tTwo is valid")
-                    selected = edge_two
-                    last_unselected = edge_one, side_one
-                    if selected.down.altitude < self.hex_grid.sealevel:
-                        finished = True
-                    segment.next = RiverSegment(self.hex_grid, selected.one.x, selected.one.y, side_two, False)
-                    segment = segment.next
-                else:
-                    # import ipdb; ipdb.set_trace()
-                    # segment.x = last_unselected[0].one.x
-                    # segment.y = last_unselected[0].one.y
-                    # segment.side = last_unselected[1]
-                    # segment.is_source = True
-                    # finished = True
-                    # print("huh?")
-
-                    # both edges are invalid, make lake at one or two
-                    # if segment.edge.one.altitude < segment.edge.two.altitude:
-                    #     lake = segment.edge.one
-                    # else:
-                    #     lake = segment.edge.two
-                    # lake.add_feature(HexFeature.lake)
-
-                    # moisture around lake increases
-                    # surrounding = lake.surrounding
-                    # for hex in surrounding:
-                    #     if hex.is_land:
-                    #         hex.moisture += 3
-
-                    # print("\tMade a lake at {}, {}".format(segment.x, segment.y))
-
-                    # make a new source river at an outer edge of the lake
-                    # chosen_edge = random.choice(lake.outer_edges)
-                    # self.rivers_sources.append(RiverSegment(self.hex_grid, chosen_edge.one.x, chosen_edge.one.y, chosen_edge.side, True))
-
-                    finished = True
+        grid = self.hex_grid
+        size = grid.size
+        registry = grid.river_registry
+        river_edges = []
+        sources = [(s.x * size + s.y, SIDE_COLUMNS[s.side]) for s in self.rivers_sources]
+        with Timer("Tracing rivers", self.debug):
+            traced = trace_rivers(grid, sources, self.params.get('river_workers'))
+        for number, (segment, (edges, reached_sea)) in enumerate(zip(self.rivers_sources, traced)):
+            registry.add(int(grid.edge_keys[edges[0]]), number)
+            for index, column in edges[1:]:
+                x, y = divmod(index, size)
+                segment.next = RiverSegment(grid, x, y, SIDES[column], False)
+                segment = segment.next
+                registry.add(int(grid.edge_keys[index, column]), number)
+            # the segment that reaches the sea doesn't wet the land
+            river_edges.extend(edges[:-1] if reached_sea else edges)
 
         final = []
 
-        for r in self.rivers_sources:
+        for number, r in enumerate(self.rivers_sources):
             # remove rivers that are too small
             if r.size > 2:
                 final.append(r)
@@ -720,17 +438,64 @@ class MapGen:
                     # print("Segment: ", r.next)
                     final.append(r.next)
                     r = r.next
-        for r in final:
-            r.edge.is_river = True
+            else:
+                registry.remove_river(number)
         self.rivers = final
+        self.river_index = RiverIndex(self.hex_grid.size, final)
+
+        counts = np.zeros((size * size, 6), dtype=np.int64)
+        if river_edges:
+            np.add.at(counts, tuple(np.transpose(river_edges)), 1)
+        return counts.reshape(size, size, 6)
+
+    def _generate_moisture(self, river_counts=None):
+        """
+        Gives land hexes moisture from the rivers, the coast and aquifers. Each source is
+        counted at its hexes first, then spread over its radius in one pass
+        :param river_counts: array of shape (size, size, 6), the river segments along each edge
+        """
+        grid = self.hex_grid
+        shape = (grid.size, grid.size)
+        land = grid.land
+
+        if self.params.get('hydrosphere'):
+            # a segment wets the hexes within 3 of either of its hexes, then those next to them once more
+            moisture = grid.neighborhood.edge_sum(river_counts, 3) + grid.neighborhood.edge_sum(river_counts, 1)
+
+            # give coastal land hexes moisture based on how close to the coast they are
+            # TODO: replace with more realistic model
+            print("Making coastal moisture") if self.debug else False
+            distance = grid.distance
+            moisture += distance <= 5
+            moisture += np.where(distance <= 3, self.rng.integers(1, 4, shape), 0)
+            moisture += np.where(distance <= 1, self.rng.integers(1, 7, shape), 0)
+            grid.moisture[land] += moisture[land].astype(grid.moisture.dtype)
+
+        # generate aquifers
+        num_aquifers = int(self.rng.integers(5, 26))
+        candidates = np.flatnonzero(land & (grid.moisture < 5))
+        if self.params.get('hydrosphere') is False or self.params.get('sea_percent') == 100 \
+                or len(candidates) == 0:
+            num_aquifers = 0
+
+        print("Making {} aquifers".format(num_aquifers)) if self.debug else False
+        counts = np.bincount(self.rng.choice(candidates, num_aquifers) if num_aquifers else [],
+                             minlength=grid.size * grid.size).reshape(shape)
+        # every aquifer within 3 hexes adds 0 to 2, within 2 hexes adds 1 and next to it adds 1
+        covering = grid.ball_sum(counts, 3)
+        draws = self.rng.integers(0, 3, (covering.max(initial=0),) + shape)
+        moisture = (draws * (np.arange(len(draws))[:, np.newaxis, np.newaxis] < covering)).sum(axis=0)
+        moisture += grid.ball_sum(counts, 2) + grid.ball_sum(counts, 1) - counts
+        grid.moisture[land] += moisture[land].astype(grid.moisture.dtype)
+        grid.invalidate_biomes()
 
     def _determine_landforms(self):
         # single hex geoforms
         with Timer("Finding geographic features", self.debug):
             with Timer("\tPlacing initial geoforms", self.debug):
-                for y, row in enumerate(self.hex_grid.grid):
-                    for x, col in enumerate(row):
-                        h = self.hex_grid.grid[x][y]
+                for y in range(self.hex_grid.size):
+                    for x in range(self.hex_grid.size):
+                        h = self.hex_grid.find_hex(x, y)
 
                         # Isthmus
                         if is_isthmus(h):
@@ -749,85 +514,61 @@ class MapGen:
                             h.geoform_type = GeoformType.peninsula
 
                         if h.geoform_type is not None:
-                            self.geoforms.append(Geoform(set([h]), h.geoform_type))
-
-            def flood(found, current, hex_type):
-                """ Do a flood fill at this hex over all hexes of this type without geoforms """
-                if current.geoform_type is not None:
-                    return set()
-                if current in found:
-                    return set()
-                neighbors = [h[1] for h in current.neighbors]
-                found.add(current)
-                for neighbor in neighbors:
-                    if neighbor.type is hex_type:
-                        found.update(flood(found, neighbor, hex_type))
-                return found
-
-            def give_geoform(hexes, geoform_type):
-                for h in hexes:
-                    h.geoform_type = geoform_type
-
-            # loop until every fucking hex has a geoform
-            # import ipdb; ipdb.set_trace()
+                            self.geoforms.append(Geoform(self.hex_grid, [h.index], h.geoform_type))
+
             with Timer("\tFinding contiguous geoforms", self.debug):
-                sys.setrecursionlimit(10000)
-                current = first_hex_without_geoform(self.hex_grid.grid)
-                while current is not None:
-                    if current.is_land:
-                        # try to find continents
-                        hexes = flood(set(), current, current.type)
-                        if len(hexes) < 25:
-                            geotype = GeoformType.small_island
-                        elif len(hexes) < 100:
-                            geotype = GeoformType.large_island
-                        else:
-                            geotype = GeoformType.continent
-                    else:
-                        # try to find oceans
-                        hexes = flood(set(), current, current.type)
-                        if len(hexes) < 3:
-                            geotype = GeoformType.lake
-                        elif len(hexes) < 100:
-                            geotype = GeoformType.sea
-                        else:
-                            geotype = GeoformType.ocean
-
-                    give_geoform(hexes, geotype)
-                    # hexes is a set of hexes
-                    self.geoforms.append(Geoform(hexes, geotype))
-                    # find a new hex
-                    current = first_hex_without_geoform(self.hex_grid.grid)
+                grid = self.hex_grid
+                land = grid.land
+                # hexes without a geoform yet, split into land and water
+                classes = np.where(grid.geoform_type == 0, land, -1)
+                labels, sizes = grid.label_components(classes)
+                component_land = np.zeros(len(sizes), dtype=bool)
+                component_land[labels[labels >= 0]] = land[labels >= 0]
+                geotypes = np.where(component_land,
+                                    np.select([sizes < 25, sizes < 100],
+                                              [GeoformType.small_island.id, GeoformType.large_island.id],
+                                              GeoformType.continent.id),
+                                    np.select([sizes < 3, sizes < 100],
+                                              [GeoformType.lake.id, GeoformType.sea.id],
+                                              GeoformType.ocean.id))
+                grid.geoform_type[labels >= 0] = geotypes[labels[labels >= 0]]
+
+                # make the geoforms in the order the hexes are visited, columns first
+                flat = labels.ravel(order='F')
+                members = np.argsort(flat, kind='stable')
+                starts = np.searchsorted(flat[members], np.arange(len(sizes) + 1))
+                first = members[starts[:-1]]
+                for label in np.argsort(first):
+                    columns_first = members[starts[label]:starts[label + 1]]
+                    indexes = (columns_first % grid.size) * grid.size + columns_first // grid.size
+                    self.geoforms.append(Geoform(grid, indexes, GeoformType.get(int(geotypes[label]))))
 
             # now we have geoforms
 
             # FIND NEIGHBORING GEOFORMS
-            def calculate_neighbors():
-                """ recalculate neighboring geoforms """
-                for geoform in self.geoforms:
-                    geoform.neighbors.clear()
-                    for h in geoform.hexes:
-                        ng = [n[1].geoform for n in h.neighbors if n[1].geoform is not geoform]
-                        geoform.neighbors.update(ng)
-                    assert geoform not in geoform.neighbors, 'A Geoform should not be in its own neighbors set'
-            calculate_neighbors()
+            # neighbors are found once from the edges between geoforms,
+            # merging a geoform then hands its neighbors to the one it merged into
+            link_geoforms(self.hex_grid)
 
             with Timer("\tMerging geoforms", self.debug):
                 # MERGE GEOFORMS
                 # merge all neighboring geoforms of like type
                 for geoform in self.geoforms:
-                    for neighbor in geoform.neighbors:
-                        if geoform.type is neighbor.type:
-                            # remove neighbor
+                    if geoform.to_delete:
+                        continue
+                    like = geoform.neighbor_of_type(geoform.type)
+                    while len(like) > 0:
+                        for neighbor in like:
                             print('Merging {} '.format(geoform.type))
                             geoform.merge(neighbor)
-
-                calculate_neighbors()
+                        like = geoform.neighbor_of_type(geoform.type)
 
                 # if an island is next to a continent or island separated by an isthmus,
                 # and that island doesn't have any other isthmuses
                 # the island becomes a peninsula
                 for geoform in self.geoforms:
+                    if geoform.to_delete:
+                        continue
                     if geoform.type is GeoformType.isthmus:
                         islands = geoform.neighbor_of_type(GeoformType.small_island)
                         land_form = geoform.neighbor_of_types([GeoformType.continent,
@@ -844,24 +585,22 @@ class MapGen:
                                 islands[0].merge(geoform) # merge the island and the isthmus
                                 islands[0].type = GeoformType.peninsula # change island to peninsula
 
-                calculate_neighbors()
-
                 # small islands separated by an isthmus to a large island should
                 # be merged into the large island
                 for geoform in self.geoforms:
+                    if geoform.to_delete:
+                        continue
                     if geoform.type is GeoformType.small_island:
                         large_islands = geoform.neighbor_of_type(GeoformType.large_island)
                         if len(large_islands) > 0:
                             print('Merging small island into large island')
                             large_islands[0].merge(geoform)
 
-                calculate_neighbors()
-
-
-
                 # islands separated by an isthmus with a continent should be merged
                 # TODO: maybe large islands should be a new continent
                 for geoform in self.geoforms:
+                    if geoform.to_delete:
+                        continue
                     if geoform.type is GeoformType.large_island or \
                        geoform.type is GeoformType.small_island:
                         isthmuses = geoform.neighbor_of_type(GeoformType.isthmus)
@@ -880,10 +619,10 @@ class MapGen:
                             for c in continents[1:]:
                                 continents[0].merge(c)
 
-                calculate_neighbors()
-
                 # if a peninsula is next to a isthmus, merge them into one peninsula
                 for geoform in self.geoforms:
+                    if geoform.to_delete:
+                        continue
                     if geoform.type is GeoformType.peninsula:
                         isthmuses = geoform.neighbor_of_type(GeoformType.isthmus)
                         if len(isthmuses) == 1:
@@ -894,11 +633,9 @@ class MapGen:
                         if geoform.size == 2 and len(geoform.neighbors) == 0:
                             geoform.type = GeoformType.small_island
 
-                calculate_neighbors()
-
-                # remove old geoforms
+            # remove old geoforms, pointing their hexes at what they merged into
             print("Deleting {} geoforms".format(len([g for g in self.geoforms if g.to_delete is True])))
-            self.geoforms = [g for g in self.geoforms if g.to_delete is False]
+            self.geoforms = resolve_geoforms(self.hex_grid)
             print("There is now {} geoforms".format(len(self.geoforms)))
 
     def is_river(self, edge):
@@ -907,21 +644,31 @@ class MapGen:
         :param edge: Edge
         :return: Boolean
         """
-        for r in self.rivers_sources:
-            while r.next is not None:
-                if r.edge == edge:
-                    return True
-                r = r.next
-        return False
+        return edge.key in self.hex_grid.river_registry
+
+    def river_owner(self, edge):
+        """
+        Finds the river that flows along an edge
+        :param edge: Edge
+        :return: source RiverSegment or None
+        """
+        number = self.hex_grid.river_registry.owner(edge.key)
+        if number is None:
+            return None
+        return self.rivers_sources[number]
 
     def find_river(self, x, y):
         """ Finds river segments at an hex's x and y coordinates. Returns a list of EdgeSides
             representing where the river segments are """
-        seg = []
-        for s in self.rivers:
-            if s.x == x and s.y == y:
-                seg.append(s.side)
-        return seg
+        return self.river_index.find(x, y)
+
+    def river_hexes(self):
+        """ x, y coordinates of every hex with a river segment """
+        return self.river_index.hexes
+
+    def river_segment_counts(self):
+        """ Array of the number of river segments at each hex """
+        return self.river_index.counts
 
     def export(self, filename):
         """ Export the map data as a JSON file """
@@ -941,28 +688,31 @@ class MapGen:
                 "hexes": [],
                 "geoforms": []
             }
-            def edge_dict(edge):
+            edges = self.hex_grid.edges
+            edge_rivers, edge_coasts, edge_directions = edges.river, edges.coast, edges.direction
+
+            def edge_dict(index, column):
                 return dict(
-                    is_river=edge.is_river,
-                    is_coast=edge.is_coast,
-                    direction=edge.direction.name
+                    is_river=bool(edge_rivers[index, column]),
+                    is_coast=bool(edge_coasts[index, column]),
+                    direction=DIRECTIONS[edge_directions[index, column]].name
                 )
-            for x, row in enumerate(self.hex_grid.grid):
+            temperatures = np.round(self.hex_grid.temperature.mean(axis=2), 2)
+            for x in range(self.hex_grid.size):
                 row_data = []
-                for y, col in enumerate(row):
+                for y in range(self.hex_grid.size):
                     h = self.hex_grid.find_hex(x, y)
                     color_temperature = (
                         (h.color_temperature[0][0] + h.color_temperature[1][0]) / 2,
                         (h.color_temperature[0][1] + h.color_temperature[1][1]) / 2,
                         (h.color_temperature[0][2] + h.color_temperature[1][2]) / 2
                     )
-                    temperature = round((h.temperature[0] + h.temperature[1]) / 2, 2)
                     row_data.append({
                         "id": h.id.hex,
                         "x": x,
                         "y": y,
                         "altitude": h.altitude,
-                        "temperature": temperature,
+                        "temperature": float(temperatures[x, y]),
                         "moisture": h.moisture,
                         "biome": h.biome.to_dict(),
                         "type": h.type.name,
@@ -976,14 +726,8 @@ class MapGen:
                             "biome": h.color_biome,
                             "rivers": h.color_rivers
                         },
-                        "edges": {
-                            "east": edge_dict(h.edge_east),
-                            "north_east": edge_dict(h.edge_north_east),
-                            "north_west": edge_dict(h.edge_north_west),
-                            "west": edge_dict(h.edge_west),
-                            "south_west": edge_dict(h.edge_south_west),
-                            "south_east": edge_dict(h.edge_south_east)
-                        }
+                        "edges": dict((side.name, edge_dict(h.index, column))
+                                      for column, side in enumerate(SIDES))
                     })
                 data['hexes'].append(row_data)
             for geoform in self.geoforms:
@@ -993,5 +737,6 @@ class MapGen:
                 json.dump(data, outfile)
         return data
 
-from hexgen.river import RiverSegment
+from hexgen.river import RiverSegment, RiverIndex, trace_rivers
+from hexgen.edge import SIDES, SIDE_COLUMNS, DIRECTIONS
 from hexgen.hex import Hex, HexSide, HexFeature
@@ -0,0 +1,209 @@
+from collections import OrderedDict
+
+import numpy as np
+
+
+class Neighborhood:
+    """
+    Hexes within a radius of other hexes. Away from the poles every hex of a row parity
+    sees the same pattern of offsets, so each radius keeps one offset kernel per parity and
+    only walks the neighbor table for the rows that wrap onto themselves near the poles.
+    Only the most recently used kernels are kept
+    """
+
+    def __init__(self, grid, max_kernels=8):
+        self.grid = grid
+        self.max_kernels = max_kernels
+        self._kernels = OrderedDict()  # radius or ('edges', radius) -> kernel dict, least recently used first
+
+    def _walk(self, indexes, radius):
+        """
+        Hexes within radius hexes of each of the given hexes, by walking the neighbor table
+        :return: (ball, valid) arrays of shape (len(indexes), width), each row holding
+                 its distinct hexes in order followed by repeats where valid is False
+        """
+        size = self.grid.size
+        sentinel = size * size
+        table = np.vstack([self.grid.neighbor_table, np.full((1, 6), sentinel)])
+        ball = np.asarray(indexes, dtype=np.int64)[:, np.newaxis]
+        for _ in range(radius):
+            ball = np.sort(np.concatenate([ball, table[ball].reshape(len(ball), -1)], axis=1), axis=1)
+            repeat = np.zeros(ball.shape, dtype=bool)
+            repeat[:, 1:] = ball[:, 1:] == ball[:, :-1]
+            ball[repeat] = sentinel
+            ball = np.sort(ball, axis=1)
+            ball = ball[:, :max(1, int((ball < sentinel).sum(axis=1).max(initial=0)))]
+        valid = ball < sentinel
+        return np.where(valid, ball, ball[:, :1]), valid
+
+    def _build(self, radius):
+        size = self.grid.size
+        rows = np.arange(size)
+        # rows this close to the top or bottom wrap onto themselves within the radius
+        near_pole = (rows < radius) | (rows > size - 1 - radius)
+        if size <= 2 * radius + 1:
+            near_pole[:] = True
+
+        offsets = []
+        for parity in (0, 1):
+            centers = rows[~near_pole & (rows % 2 == parity)]
+            if len(centers) == 0:
+                offsets.append(None)
+                continue
+            x0 = centers[0]
+            ball, _ = self._walk([x0 * size], radius)
+            dx, dy = np.divmod(ball[0], size)
+            offsets.append((dx - x0, (dy + size // 2) % size - size // 2))
+
+        pole_rows = rows[near_pole]
+        slot = np.full(size, -1, dtype=np.int64)
+        slot[pole_rows] = np.arange(len(pole_rows))
+        pole_ball, pole_valid = self._walk(np.flatnonzero(np.repeat(near_pole, size)), radius)
+        width = max(3 * radius * (radius + 1) + 1, pole_ball.shape[1])
+        padding = width - pole_ball.shape[1]
+        pole_ball = np.pad(pole_ball, ((0, 0), (0, padding)), mode='edge')
+        pole_valid = np.pad(pole_valid, ((0, 0), (0, padding)))
+        return dict(near_pole=near_pole, offsets=offsets, slot=slot, width=width,
+                    pole_ball=pole_ball, pole_valid=pole_valid)
+
+    def _build_edges(self, radius):
+        size = self.grid.size
+        rows = np.arange(size)
+        # the far hex of an edge is a row further away
+        near_pole = self.kernel(radius + 1)['near_pole']
+        column = size // 2
+        offsets = {}
+        for parity in (0, 1):
+            centers = rows[~near_pole & (rows % 2 == parity)]
+            if len(centers) == 0:
+                continue
+            x0 = centers[0]
+            one = x0 * size + column
+            for direction in range(6):
+                two = self.grid.neighbor_table[one, direction]
+                union = np.union1d(self.around(one, radius), self.around(two, radius))
+                dx, dy = np.divmod(union, size)
+                offsets[parity, direction] = (dx - x0, (dy - column + size // 2) % size - size // 2)
+        return dict(near_pole=near_pole, offsets=offsets)
+
+    def _cached(self, key, build):
+        kernel = self._kernels.get(key)
+        if kernel is None:
+            kernel = build()
+            self._kernels[key] = kernel
+            while len(self._kernels) > self.max_kernels:
+                self._kernels.popitem(last=False)
+        else:
+            self._kernels.move_to_end(key)
+        return kernel
+
+    def kernel(self, radius):
+        """
+        Offsets and pole rows of a radius, built on first use
+        :return: dict of near_pole (bool per row), offsets ((dx, dy) arrays for even
+                 and odd rows), slot (row of pole_ball for each pole row), width,
+                 pole_ball and pole_valid
+        """
+        return self._cached(radius, lambda: self._build(radius))
+
+    def around_many(self, indexes, radius):
+        """
+        Hexes within radius hexes of each of the given hexes, themselves included
+        :param indexes: flat hex indexes
+        :return: (ball, valid) arrays of shape (len(indexes), width). Where valid is
+                 False the ball holds a repeat of a hex already in the row
+        """
+        size = self.grid.size
+        kernel = self.kernel(radius)
+        indexes = np.asarray(indexes, dtype=np.int64).ravel()
+        x, y = np.divmod(indexes, size)
+        ball = np.empty((len(indexes), kernel['width']), dtype=np.int64)
+        valid = np.zeros(ball.shape, dtype=bool)
+
+        pole = kernel['near_pole'][x]
+        for parity, offset in enumerate(kernel['offsets']):
+            chosen = ~pole & (x % 2 == parity)
+            if offset is None or not chosen.any():
+                continue
+            dx, dy = offset
+            count = len(dx)
+            ball[chosen, :count] = (x[chosen, np.newaxis] + dx) * size + (y[chosen, np.newaxis] + dy) % size
+            ball[chosen, count:] = indexes[chosen, np.newaxis]
+            valid[chosen, :count] = True
+
+        if pole.any():
+            rows = kernel['slot'][x[pole]] * size + y[pole]
+            ball[pole] = kernel['pole_ball'][rows]
+            valid[pole] = kernel['pole_valid'][rows]
+        return ball, valid
+
+    def around(self, index, radius):
+        """
+        Hexes within radius hexes of a hex, itself included
+        :param index: flat hex index
+        :return: int64 array of distinct flat indexes
+        """
+        ball, valid = self.around_many([index], radius)
+        return ball[0][valid[0]]
+
+    def sum(self, values, radius):
+        """
+        Sums values over every hex within radius hexes of each hex, itself included
+        :param values: array of shape (size, size)
+        :return: array of shape (size, size)
+        """
+        size = self.grid.size
+        values = np.asarray(values)
+        dtype = np.float64 if values.dtype.kind == 'f' else np.int64
+        result = np.zeros((size, size), dtype=dtype)
+        kernel = self.kernel(radius)
+        rows = np.arange(size)
+
+        for parity, offset in enumerate(kernel['offsets']):
+            centers = rows[~kernel['near_pole'] & (rows % 2 == parity)]
+            if offset is None or len(centers) == 0:
+                continue
+            for ox, oy in zip(*offset):
+                result[centers] += np.roll(values[centers + ox], -oy, axis=1)
+
+        poles = np.flatnonzero(np.repeat(kernel['near_pole'], size))
+        if len(poles) > 0:
+            ball, valid = self.around_many(poles, radius)
+            result.ravel()[poles] = (values.ravel()[ball] * valid).sum(axis=1)
+        return result
+
+    def edge_sum(self, counts, radius):
+        """
+        Counts for every hex the edges with either of their hexes within radius hexes of it
+        :param counts: array of shape (size, size, 6), how many times each edge is counted,
+                       kept at one of its hexes in the column of the other in the neighbor table
+        :return: int64 array of shape (size, size)
+        """
+        size = self.grid.size
+        counts = np.asarray(counts)
+        result = np.zeros((size, size), dtype=np.int64)
+        kernel = self._cached(('edges', radius), lambda: self._build_edges(radius))
+        rows = np.arange(size)
+
+        # spread each edge over the union of the balls about its two hexes
+        for (parity, direction), (dx, dy) in kernel['offsets'].items():
+            centers = rows[~kernel['near_pole'] & (rows % 2 == parity)]
+            for ox, oy in zip(dx, dy):
+                result[centers + ox] += np.roll(counts[centers, :, direction], oy, axis=1)
+
+        # near the poles find the union of each edge's balls one edge at a time
+        pole = np.repeat(kernel['near_pole'], size)
+        index, direction = np.nonzero(counts.reshape(-1, 6) * pole[:, np.newaxis])
+        if len(index) > 0:
+            weight = counts.reshape(-1, 6)[index, direction]
+            ball_one, valid_one = self.around_many(index, radius)
+            ball_two, valid_two = self.around_many(self.grid.neighbor_table[index, direction], radius)
+            sentinel = size * size
+            ball = np.where(np.concatenate([valid_one, valid_two], axis=1),
+                            np.concatenate([ball_one, ball_two], axis=1), sentinel)
+            ball = np.sort(ball, axis=1)
+            first = ball < sentinel
+            first[:, 1:] &= ball[:, 1:] != ball[:, :-1]
+            weights = np.broadcast_to(weight[:, np.newaxis], ball.shape)
+            result += np.bincount(ball[first], weights[first], sentinel).astype(np.int64).reshape(size, size)
+        return result
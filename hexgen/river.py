@@ -1,4 +1,9 @@
+import os
 import uuid
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from hexgen.edge import SIDES, SIDE_COLUMNS, DIRECTIONS
 
 
 class RiverSegment:
@@ -42,3 +47,165 @@ class RiverSegment:
         :return: True if both edges are equal
         """
         return self.edge == other.edge
+
+
+class RiverRegistry:
+    """
+    Which river owns each edge, keyed on the canonical edge id (Edge.key).
+    Rivers are numbered by their position in MapGen.rivers_sources.
+    """
+    def __init__(self):
+        self.owners = dict() # edge key -> river number
+        self.edges = dict() # river number -> list of edge keys
+
+    def add(self, key, river):
+        """ Claims an edge for a river. An edge keeps the first river that claimed it """
+        if key not in self.owners:
+            self.owners[key] = river
+            self.edges.setdefault(river, []).append(key)
+
+    def owner(self, key):
+        """ The river number that owns this edge, or None """
+        return self.owners.get(key)
+
+    def remove_river(self, river):
+        """ Releases every edge claimed by a river """
+        for key in self.edges.pop(river, []):
+            del self.owners[key]
+
+    def __contains__(self, key):
+        return key in self.owners
+
+    def __len__(self):
+        return len(self.owners)
+
+
+class RiverIndex:
+    """ The river segments of each hex, built once the rivers are final """
+    def __init__(self, size, segments):
+        self.size = size
+        self.sides = dict() # hex index -> list of HexSide
+        self.counts = np.zeros((size, size), dtype=np.int32) # number of segments at each hex
+        for s in segments:
+            self.sides.setdefault(s.x * size + s.y, []).append(s.side)
+            self.counts[s.x, s.y] += 1
+
+    def find(self, x, y):
+        """ HexSides of the river segments at this hex """
+        return list(self.sides.get(x * self.size + y, ()))
+
+    @property
+    def hexes(self):
+        """ x, y coordinates of every hex with a river segment """
+        return [divmod(index, self.size) for index in sorted(self.sides)]
+
+
+def river_tables(grid):
+    """
+    Everything the river tracer reads, for every edge as (hex index, side column) pairs
+    :return: dict of numpy arrays:
+             two: hex across the edge
+             down: lower of the two hexes at the ends of the edge, as Edge.down
+             branches: side columns of the two edges a river can fork into from the down hex
+             keys: canonical edge id
+             altitude: flat altitude of every hex
+    """
+    edges = grid.edges
+    forks = np.array([[[SIDE_COLUMNS[s] for s in side.branching(d)] for d in DIRECTIONS] for side in SIDES])
+    branches = forks[np.arange(6), edges.direction]
+    return dict(two=grid.neighbor_table, down=edges.down, branches=branches, keys=grid.edge_keys,
+                altitude=grid.altitude.ravel().copy())
+
+
+def trace_river(tables, sealevel, source, claimed=()):
+    """
+    Follows a river downhill from its source edge until it reaches the sea or can go no further
+    :param tables: dict from river_tables
+    :param source: (hex index, side column) of the source edge
+    :param claimed: edge keys taken by other rivers
+    :return: (edges, reached_sea, consulted) where edges are the (hex index, side column) of every
+             segment, and consulted the keys of the other rivers' edges the trace depended on
+    """
+    two, down, branches, keys, altitude = (tables[name] for name in ('two', 'down', 'branches', 'keys', 'altitude'))
+    index, column = source
+    edges = [(index, column)]
+    own = {int(keys[index, column])}
+    consulted = []
+
+    def taken(key):
+        if key in own:
+            return True
+        consulted.append(key)
+        return key in claimed
+
+    # a river can't use an edge twice, so it has fewer steps than the map has edges
+    for _ in range(len(altitude) * 3):
+        lower = int(down[index, column])
+        ends = (index, int(two[index, column]))
+        side_one, side_two = (int(side) for side in branches[index, column])
+        one_valid = int(down[lower, side_one]) not in ends
+        two_valid = int(down[lower, side_two]) not in ends
+        if taken(int(keys[lower, side_one])):
+            one_valid = False
+        elif taken(int(keys[lower, side_two])):
+            two_valid = False
+
+        if one_valid and two_valid:
+            if altitude[down[lower, side_one]] < altitude[down[lower, side_two]]:
+                selected = side_one
+            else:
+                selected = side_two
+        elif one_valid or two_valid:
+            selected = side_one if one_valid else side_two
+        else:
+            return edges, False, consulted
+
+        index, column = lower, selected
+        edges.append((index, column))
+        own.add(int(keys[index, column]))
+        if altitude[down[index, column]] < sealevel:
+            return edges, True, consulted
+    return edges, False, consulted
+
+
+_worker_tables = None
+
+
+def _start_worker(tables, sealevel):
+    global _worker_tables
+    _worker_tables = tables, sealevel
+
+
+def _trace_alone(source):
+    tables, sealevel = _worker_tables
+    return trace_river(tables, sealevel, source)
+
+
+def trace_rivers(grid, sources, workers=1):
+    """
+    Traces rivers from their source edges. Every source is first traced on its own, on a pool of
+    processes when workers is more than 1. Then, in source order, each trace is kept if none of the
+    edges it checked were taken by an earlier river, and traced again against them if not.
+    So the rivers are the same as tracing them one after another, whatever the number of workers
+    :param sources: list of (hex index, side column) source edges
+    :param workers: number of processes, None for one per CPU
+    :return: list of (edges, reached_sea) for each source, as trace_river
+    """
+    tables = river_tables(grid)
+    sealevel = grid.sealevel
+    if workers == 1 or len(sources) < 2:
+        _start_worker(tables, sealevel)
+        alone = [_trace_alone(source) for source in sources]
+    else:
+        workers = workers or os.cpu_count()
+        with ProcessPoolExecutor(workers, initializer=_start_worker, initargs=(tables, sealevel)) as pool:
+            alone = list(pool.map(_trace_alone, sources, chunksize=max(1, len(sources) // (4 * workers))))
+
+    claimed = set()
+    rivers = []
+    for source, (edges, reached_sea, consulted) in zip(sources, alone):
+        if any(key in claimed for key in consulted):
+            edges, reached_sea, _ = trace_river(tables, sealevel, source, claimed)
+        rivers.append((edges, reached_sea))
+        claimed.update(int(tables['keys'][edge]) for edge in edges)
+    return rivers
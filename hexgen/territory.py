@@ -1,8 +1,6 @@
-import sys
-sys.setrecursionlimit(1500)
-import random
+import numpy as np
 
-from hexgen.hex import Hex
+from hexgen.hex import Hex, BIOMES
 
 class Territory:
 
@@ -12,56 +10,50 @@ class Territory:
         self.color = color
         self.main = main  # main Hex
         main.territory = self
-        self.last_added = [main]
-        self.members = [main]  # Hexes part of this territory
         self.groups = []
         self.db_instance = None
 
     @property
-    def frontier(self):
-        """ Gets a list of hexes that border this territory that are unowned"""
-        frontier = []
-        for m in self.last_added:
-            frontier.extend([h for h in m.surrounding if h.is_owned is False])
-        return frontier
+    def indexes(self):
+        """ Flat indexes of the hexes in this territory """
+        return np.flatnonzero(self.grid.territory_id.ravel() == self.id)
+
+    @property
+    def members(self):
+        """ Hexes part of this territory """
+        return [self.grid.hex_at_index(i) for i in self.indexes]
+
+    def _around(self):
+        """ Indexes of the neighbors of every member """
+        return self.grid.neighbor_table[self.indexes].ravel()
 
     @property
     def landlocked(self):
-        for h in self.members:
-            if any([h for h in h.surrounding if h.is_water]):
-                return False
-        return True
+        return bool(self.grid.land.ravel()[self._around()].all())
 
     @property
     def neighbors(self):
         """ Returns a set of Territories this territory is next to """
-        terr = set()
-        for h in self.members:
-            terr.update(set([m.territory for m in h.surrounding
-                             if m.is_land and m.territory is not None
-                             and m.territory.id != self.id]))
-        return terr
+        around = self._around()
+        ids = self.grid.territory_id.ravel()[around]
+        ids = ids[self.grid.land.ravel()[around] & (ids >= 0) & (ids != self.id)]
+        return set(self.grid.territories[i] for i in np.unique(ids))
 
     @property
     def avg_temp(self):
-        return round(sum([h.temperature for h in self.members]) / self.size, 2)
+        """ Average temperature over both seasons """
+        return round(float(self.grid.temperature.reshape(-1, 2)[self.indexes].mean()), 2)
 
     @property
     def avg_moisture(self):
-        return round(sum([h.moisture for h in self.members]) / self.size, 2)
+        return round(float(self.grid.moisture.ravel()[self.indexes].mean()), 2)
 
     @property
     def biomes(self):
         """ Gets a list of biomes and percents """
-        b = dict()
-        for h in self.members:
-            if h.biome.name in b:
-                b[h.biome.name]['count'] += 1
-            else:
-                b[h.biome.name] = dict(biome=h.biome,
-                                       count=1)
-        return sorted(b.values(), key=lambda k: k['count'], reverse=True)
-
+        counts = np.bincount(self.grid.biome_id.ravel()[self.indexes], minlength=len(BIOMES))
+        b = [dict(biome=BIOMES[i], count=int(counts[i])) for i in np.flatnonzero(counts)]
+        return sorted(b, key=lambda k: k['count'], reverse=True)
 
     def __eq__(self, other):
         return self.id == other.id
@@ -78,54 +70,40 @@ class Territory:
     def find_groups(self):
         """
         Calculates the contiguous groups of hexes in this territory
-        :return:
         """
-        #print("Territory {}: Members: {}".format(self.id, len(self.members)))
-
-        def find_unmarked():
-            while True:
-                found = random.choice(self.members)
-                if found.marked is False:
-                    return found
-
-        def step(sh, group):
-            if sh.marked:
-                return
-            else:
-                sh.marked = True
-                group.append(sh)
-
-            sur = [s for s in sh.map_surrounding if s.is_land
-                   and s.territory is not None
-                   and s.territory == self
-                   and s.marked is False]
-            # print("\t\tStep into HEX: {}, {} -> Found: {}".format(sh.x, sh.y, len(sur)))
-            for h in sur:
-                step(h, group)
-
-        def num_marked():
-            return len([h for h in self.members if h.marked])
-
-        groups = []
-        while num_marked() < len(self.members):
-            #print("\t{} < {}".format(num_marked(), len(self.members)))
-            group = []
-            sh = find_unmarked()
-            step(sh, group)
-            groups.append(group)
-
-        #print(groups)
-        result = []
-        for g in groups:
-            mx_s = [h.x for h in g]
-            mx = sum(mx_s) / len(mx_s)
-            my_s = [h.y for h in g]
-            my = sum(my_s) / len(my_s)
-            result.append(dict(size=len(g),
-                               x=round(mx),
-                               y=round(my)))
-        self.groups = result
+        find_groups(self.grid, [self])
 
     @property
     def size(self):
-        return len(self.members)
+        return int(np.count_nonzero(self.grid.territory_id == self.id))
+
+
+def find_groups(grid, territories):
+    """
+    Labels the contiguous groups of land hexes of every territory in one pass, and
+    fills in Territory.groups with the size and rounded centroid of each
+    :param grid: Grid
+    :param territories: list of Territory
+    :return: (labels, owners, sizes, centroids) where labels is an int32 array of shape
+             (size, size) numbering each group and -1 for hexes not in one, owners is the
+             territory id of each group and centroids is a (groups, 2) array of x, y
+    """
+    ids = np.array([t.id for t in territories], dtype=np.int32)
+    classes = np.where(grid.land & np.isin(grid.territory_id, ids), grid.territory_id, -1)
+    labels, sizes = grid.label_components(classes, wrap=False)
+
+    grouped = labels >= 0
+    x, y = np.nonzero(grouped)
+    members = labels[grouped]
+    owners = np.zeros(len(sizes), dtype=np.int32)
+    owners[members] = classes[grouped]
+    centroids = np.stack([np.bincount(members, weights=x, minlength=len(sizes)),
+                          np.bincount(members, weights=y, minlength=len(sizes))], axis=1)
+    centroids = np.rint(centroids / sizes[:, np.newaxis]).astype(int)
+
+    groups = dict((t.id, []) for t in territories)
+    for owner, size, (cx, cy) in zip(owners, sizes, centroids):
+        groups[owner].append(dict(size=int(size), x=int(cx), y=int(cy)))
+    for t in territories:
+        t.groups = groups[t.id]
+    return labels, owners, sizes, centroids
@@ -0,0 +1,46 @@
+from unittest import TestCase
+
+import numpy as np
+
+from hexgen.biome import terran_biome, classify_biomes, TERRAN_TABLE, BIOME_IDS
+from hexgen.enums import Biome, MapType
+from hexgen.grid import Grid
+from hexgen.heightmap import Heightmap
+from hexgen.mapgen import default_params
+
+class TestBiomeTable(TestCase):
+
+    def test_terran(self):
+        temperature, rain = np.meshgrid(np.linspace(-30, 40, 141), np.arange(0, 30, 0.5))
+        ids = TERRAN_TABLE.classify(temperature, rain)
+        for t, r, biome_id in zip(temperature.ravel(), rain.ravel(), ids.ravel()):
+            self.assertEqual(biome_id, BIOME_IDS[terran_biome(t, r)],
+                             "Wrong biome at temperature {} and rainfall {}".format(t, r))
+
+    def test_invalid(self):
+        with self.assertRaises(Exception):
+            TERRAN_TABLE.classify(np.array([5.0]), np.array([-1]))
+
+
+class TestClassifyBiomes(TestCase):
+
+    def setUp(self):
+        params = dict(default_params, size=20, grid_backend='columnar')
+        self.grid = Grid(Heightmap(params), params)
+
+    def test_grid(self):
+        h = self.grid.find_hex(4, 5)
+        h.moisture = 12
+        expected = terran_biome(h.temperature[0], 12)
+        self.assertIs(h.biome, expected)
+        self.assertEqual(self.grid.biome_id.shape, (20, 20))
+        h.moisture = 30
+        self.assertIs(h.biome, terran_biome(h.temperature[0], 30), "Changing moisture should change the biome")
+
+    def test_volcanic(self):
+        self.grid.params = dict(self.grid.params, map_type=MapType.volcanic)
+        self.grid.altitude[:] = 100
+        self.grid.altitude[0, 0] = 10
+        ids = classify_biomes(self.grid)
+        self.assertEqual(ids[0, 0], BIOME_IDS[Biome.volcanic_liquid])
+        self.assertEqual(ids[1, 1], BIOME_IDS[Biome.volcanic_solid])
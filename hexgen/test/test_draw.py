@@ -0,0 +1,136 @@
+import os
+import pickle
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from hexgen.draw import hex_raster, hexagon_corners, image_size, DISTANCE_SCALE, \
+    Layer, MapSnapshot, render_layers, draw_vector, draw_raster, get_font, label_stamp, hex_labels
+from hexgen.constants import SIDE_LENGTH, HEX_HEIGHT, HEX_RADIUS
+from hexgen.mapgen import MapGen, default_params
+
+
+class TestDraw(TestCase):
+
+    def setUp(self):
+        self.size = 6
+        self.index, self.side, self.distance = hex_raster(self.size, None)
+
+    def test_raster(self):
+        width, height = image_size(self.size)
+        self.assertEqual(self.index.shape, (height, width))
+        counts = np.bincount(self.index[self.index >= 0], minlength=self.size * self.size)
+        self.assertEqual(len(counts), self.size * self.size)
+        self.assertTrue((counts > 0).all(), "Every hex should have pixels")
+
+        for x in range(self.size):
+            for y in range(self.size):
+                corners = hexagon_corners(x, y)
+                cx, cy = int(corners[5][0] + HEX_RADIUS), int(corners[0][1] + HEX_HEIGHT + SIDE_LENGTH / 2)
+                self.assertEqual(self.index[cy, cx], x * self.size + y, "Hex center should be in the hex")
+                self.assertGreater(self.distance[cy, cx], 10 * DISTANCE_SCALE)
+
+    def test_sides(self):
+        # the pixels just inside the east side of a hex are nearest to the east side
+        corners = hexagon_corners(2, 2)
+        right, middle = int(corners[1][0]) - 1, int(corners[1][1] + SIDE_LENGTH / 2)
+        self.assertEqual(self.index[middle, right], 2 * self.size + 2)
+        self.assertEqual(self.side[middle, right], 0)
+        self.assertLess(self.distance[middle, right], 2 * DISTANCE_SCALE)
+        self.assertEqual(self.side[middle, right + 2], 3, "West side of the hex to the east")
+
+    def test_cache(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            made = hex_raster(self.size, cache_dir)
+            self.assertEqual(len(os.listdir(cache_dir)), 3)
+            loaded = hex_raster(self.size, cache_dir)
+            self.assertIsInstance(loaded[0], np.memmap)
+            for a, b in zip(made, loaded):
+                np.testing.assert_array_equal(a, b)
+
+    def test_fonts(self):
+        self.assertIs(get_font(None), get_font(None))
+        for _ in range(2):
+            with self.assertRaises(OSError):
+                get_font("no such font.ttf")
+        self.assertNotIn(("no such font.ttf",), get_font.cache)
+
+    def test_labels(self):
+        self.assertIs(label_stamp("12", None), label_stamp("12", None))
+        for text in ("12", "-3.25", "(9.5, 8.25)", "N", ""):
+            for xy in ((5, 5), (10, 7), (3, 4)):
+                drawn = Image.new("RGB", (120, 30), (10, 50, 90))
+                ImageDraw.Draw(drawn).text(xy, text, fill=(200, 200, 200))
+                pasted = Image.new("RGB", (120, 30), (10, 50, 90))
+                mask, values, (left, top) = label_stamp(text, None)
+                self.assertEqual(values.shape, (mask.height, mask.width))
+                pasted.paste((200, 200, 200), (xy[0] + left, xy[1] + top), mask)
+                np.testing.assert_array_equal(np.asarray(drawn), np.asarray(pasted))
+
+
+class TestRender(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.map = MapGen(dict(default_params, size=12, random_seed=2, num_territories=3), debug=False)
+        cls.layers = [
+            Layer(lambda h: (h.altitude,) * 3, "height.png", rivers=False, show_coasts=True),
+            Layer(lambda h: h.color_terrain, "terrain.png", rivers=True, show_coasts=True),
+            Layer(lambda h: h.color_territories, "territories.png", rivers=False, borders=True),
+        ]
+        cls.snapshot = MapSnapshot(cls.map, cls.layers)
+
+    def test_snapshot(self):
+        self.assertEqual(len(self.snapshot.colors), len(self.layers))
+        h = self.map.hex_grid.find_hex(3, 4)
+        np.testing.assert_array_equal(self.snapshot.colors[1][3 * 12 + 4], h.color_terrain[:3])
+        river_sides = set((index, side) for index, sides in self.map.river_index.sides.items() for side in sides)
+        self.assertEqual(self.snapshot.rivers.sum(), len(river_sides))
+
+        copy = pickle.loads(pickle.dumps(self.snapshot))
+        self.assertIsNone(copy.layers[0].color_func)
+        for number in range(len(self.layers)):
+            before = np.asarray(draw_vector(self.snapshot, number))
+            np.testing.assert_array_equal(before, np.asarray(draw_vector(copy, number)))
+
+    def test_hex_labels(self):
+        layers = [Layer(lambda h: (h.altitude,) * 3, "numbers.png", numbers=True),
+                  Layer(lambda h: (h.altitude,) * 3, "plain.png")]
+        snapshot = MapSnapshot(self.map, layers)
+        corners = hexagon_corners(3, 4)
+        self.assertIsNone(hex_labels(snapshot, 1, corners, 3 * 12 + 4))
+        mask, values, (left, top) = hex_labels(snapshot, 0, corners, 3 * 12 + 4)
+        # the same as drawing each label on its own, at the nearest pixel
+        drawn = Image.new("L", mask.size)
+        cx, cy = corners[5][0], corners[0][1]
+        offsets = [(10, 3), (4, 11), (4, 19), (18, 11), (18, 19)]
+        for (dx, dy), text in zip(offsets, snapshot.numbers[3 * 12 + 4]):
+            ImageDraw.Draw(drawn).text((round(cx + dx) - left, round(cy + dy) - top), text, fill=255)
+        np.testing.assert_array_equal(np.asarray(drawn), values)
+
+    def test_raster_labels(self):
+        # labels are covered by the hexes drawn after theirs, as in the vector engine
+        layers = [Layer(lambda h: (h.altitude,) * 3, "numbers.png", rivers=True, show_coasts=True, numbers=True)]
+        snapshot = MapSnapshot(self.map, layers)
+        raster = hex_raster(snapshot.size, None)
+        vector = np.asarray(draw_vector(snapshot, 0))
+        self.assertLess((vector != np.asarray(draw_raster(snapshot, 0, raster))).any(axis=2).mean(), 0.05)
+
+    def test_workers(self):
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as directory:
+            os.chdir(directory)
+            try:
+                os.mkdir('bin')
+                images = {}
+                for workers in (1, 2):
+                    timings = render_layers(self.snapshot, "raster", os.path.join(directory, 'cache'), workers)
+                    self.assertEqual(len(timings), len(self.layers))
+                    images[workers] = [np.asarray(Image.open(os.path.join('bin', layer.file_name)))
+                                       for layer in self.layers]
+                for one, two in zip(images[1], images[2]):
+                    np.testing.assert_array_equal(one, two)
+            finally:
+                os.chdir(cwd)
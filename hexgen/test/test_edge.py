@@ -1,6 +1,9 @@
 from unittest import TestCase
 
+import numpy as np
+
 from hexgen.hex import HexSide
+from hexgen.enums import EdgeDirection
 from hexgen.edge import Edge
 from hexgen.grid import Grid
 from hexgen.mapgen import default_params
@@ -43,3 +46,51 @@ class TestEdge(TestCase):
                         "Hex 1 Edge SE and Hex 4 Edge NW should be equal, was \n{}\n{}"
                         .format(self.e1, self.e2))
         self.assertFalse(self.e1 == self.e3, "Hex 1 Edge SE and Hex 9 Edge NW should not be equal")
+
+    def test_key(self):
+        self.assertEqual(self.e1.key, self.e2.key, "Both sides of an edge should have the same key")
+        self.assertNotEqual(self.e1.key, self.e3.key, "Different edges should have different keys")
+        keys, counts = np.unique(self.grid.edge_keys, return_counts=True)
+        self.assertTrue((counts == 2).all(), "Every edge should be shared by exactly two hex sides")
+        self.assertEqual(len(keys), self.size * self.size * 3)
+
+    def test_is_river(self):
+        self.assertFalse(self.e1.is_river)
+        self.grid.river_registry.add(self.e1.key, 0)
+        self.assertTrue(self.e2.is_river, "An edge should be a river from both sides")
+        self.grid.river_registry.remove_river(0)
+        self.assertFalse(self.e1.is_river, "Removed rivers should release their edges")
+
+    def test_table(self):
+        edges = self.grid.edges
+        shape = (self.size * self.size, 6)
+        for name in ('up', 'down', 'delta', 'direction', 'river', 'coast'):
+            self.assertEqual(getattr(edges, name).shape, shape, "{} should have an entry per side".format(name))
+        self.grid.river_registry.add(self.e1.key, 0)
+        for e in (self.e1, self.e2, self.e3):
+            self.assertEqual(edges.river[e.index, e.column], e.is_river)
+            self.assertEqual(edges.coast[e.index, e.column], e.is_coast)
+        self.assertEqual({self.e1.up, self.e1.down}, {self.h1.hex_south_west, self.h1.hex_east})
+
+    def test_slope(self):
+        up, down = self.e3.up, self.e3.down
+        self.assertGreaterEqual(up.altitude, down.altitude)
+        self.assertEqual(self.e3.delta, up.altitude - down.altitude)
+        down.altitude = up.altitude + 10
+        self.assertEqual(self.e3.up, down, "Slopes should follow the altitude")
+        self.assertEqual(self.e3.delta, 10)
+
+    def test_level_slope(self):
+        """ With level ends each side sees its own first end as up, as Hex.decide_slope did """
+        h = self.grid.find_hex(4, 4)
+        other = h.hex_north_east
+        north_west, east = h.hex_north_west, h.hex_east
+        north_west.altitude = 100
+        east.altitude = 100
+        edge, other_edge = h.get_edge(HexSide.north_east), other.get_edge(HexSide.south_west)
+        self.assertEqual(edge.key, other_edge.key)
+        self.assertEqual((edge.up, edge.down), (north_west, east))
+        self.assertEqual((other_edge.up, other_edge.down), (east, north_west))
+        self.assertEqual(edge.direction, EdgeDirection.south_east)
+        self.assertEqual(other_edge.direction, EdgeDirection.north_west)
+        self.assertEqual(edge.delta, 0)
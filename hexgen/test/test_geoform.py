@@ -0,0 +1,42 @@
+from unittest import TestCase
+
+import numpy as np
+
+from hexgen.enums import GeoformType
+from hexgen.geoform import Geoform, link_geoforms, resolve_geoforms
+from hexgen.grid import Grid
+from hexgen.mapgen import default_params
+from hexgen.heightmap import Heightmap
+
+class TestGeoform(TestCase):
+
+    def setUp(self):
+        params = default_params
+        self.size = 20
+        params['size'] = self.size
+        self.grid = Grid(Heightmap(params), dict(params, grid_backend='columnar'))
+
+        # three bands of rows: a sea between two islands
+        index = np.arange(self.size * self.size).reshape(self.size, self.size)
+        self.north = Geoform(self.grid, index[:5].ravel(), GeoformType.small_island)
+        self.sea = Geoform(self.grid, index[5:10].ravel(), GeoformType.sea)
+        self.south = Geoform(self.grid, index[10:].ravel(), GeoformType.small_island)
+        link_geoforms(self.grid)
+
+    def test_link(self):
+        self.assertEqual(self.sea.neighbors, {self.north, self.south})
+        # the top and bottom rows wrap onto themselves, so the islands don't touch
+        self.assertEqual(self.north.neighbors, {self.sea})
+        self.assertEqual(self.grid.find_hex(2, 3).geoform, self.north)
+
+    def test_merge(self):
+        self.sea.merge(self.south)
+        self.assertEqual(self.sea.size, self.size * 15)
+        self.assertEqual(self.sea.neighbors, {self.north}, "A geoform should take its neighbors from a merge")
+        self.assertEqual(self.north.neighbors, {self.sea}, "Neighbors should point at the merged geoform")
+        self.assertEqual(self.grid.find_hex(15, 3).geoform, self.sea, "Hexes should follow their geoform")
+        self.assertEqual(len(self.sea.hexes), self.size * 15)
+
+        geoforms = resolve_geoforms(self.grid)
+        self.assertEqual(geoforms, [self.north, self.sea])
+        self.assertTrue((self.grid.geoform_id[5:] == 1).all(), "Merged hexes should get the new geoform id")
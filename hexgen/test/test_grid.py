@@ -0,0 +1,216 @@
+from unittest import TestCase
+
+import numpy as np
+
+from hexgen.enums import HexFeature, HexEdge, Hemisphere, Zones, HexResourceType, HexResourceRating
+from hexgen.grid import Grid
+from hexgen.mapgen import default_params
+from hexgen.heightmap import Heightmap
+
+class TestGrid(TestCase):
+
+    def setUp(self):
+        params = default_params
+        self.size = 30
+        params['size'] = self.size
+        self.heightmap = Heightmap(params)
+
+        self.grid = Grid(self.heightmap, dict(params, grid_backend='objects'))
+        self.columnar = Grid(self.heightmap, dict(params, grid_backend='columnar'))
+
+    def test_backends(self):
+        self.assertIsNotNone(self.grid.grid, "The objects backend should make every hex")
+        self.assertIsNone(self.columnar.grid, "The columnar backend should not make any hexes")
+        h1 = self.grid.find_hex(3, 4)
+        h2 = self.columnar.find_hex(3, 4)
+        self.assertEqual(h1.altitude, h2.altitude, "Both backends should read the same altitude")
+        self.assertEqual(h1.surrounding, h2.surrounding, "Both backends should have the same neighbors")
+        self.assertEqual(list(self.grid.temperature_order), list(self.columnar.temperature_order),
+                         "Both backends should sort hexes the same way")
+
+    def test_hex_ids(self):
+        h = self.grid.find_hex(3, 4)
+        self.assertIs(h.id, self.grid.find_hex(3, 4).id, "Hex ids should be made once per grid")
+        self.assertEqual(len(set(self.grid.hex_ids)), self.size * self.size, "Every hex should have its own id")
+        self.assertNotEqual(h.id, self.columnar.find_hex(3, 4).id, "Hexes of different grids should differ")
+
+    def test_view(self):
+        h = self.columnar.find_hex(5, 6)
+        h.moisture += 3
+        h.add_feature(HexFeature.crater)
+        self.assertEqual(self.columnar.moisture[5, 6], 3, "Hex views should write to the grid arrays")
+        other = self.columnar.find_hex(5, 6)
+        self.assertTrue(other.has_feature(HexFeature.crater), "Features should be kept in the grid")
+        self.assertFalse(other.has_feature(HexFeature.volcano), "Only added features should be set")
+        self.assertEqual(other.features, {HexFeature.crater})
+        other.remove_feature(HexFeature.crater)
+        self.assertFalse(h.has_feature(HexFeature.crater), "Features should be removable")
+
+    def test_neighbor_table(self):
+        table = self.grid.neighbor_table
+        self.assertEqual(table.shape, (self.size * self.size, 6))
+        h = self.grid.find_hex(4, 7)
+        for direction in HexEdge:
+            n = h.neighbor_at(direction)
+            self.assertEqual(table[h.index, direction.id - 1], n.index,
+                             "Neighbor table is wrong to the {}".format(direction.title))
+        # every hex is a neighbor of each of its neighbors
+        index = np.arange(self.size * self.size)
+        for column in range(6):
+            back = table[table[:, column]]
+            self.assertTrue((back == index[:, np.newaxis]).any(axis=1).all(),
+                            "Neighbor table is not symmetric")
+
+    def test_map_neighbor_table(self):
+        corner = self.grid.find_hex(0, 0)
+        self.assertEqual(len(corner.map_surrounding), 2, "The corner hex should have two neighbors")
+        self.assertEqual(len(self.grid.find_hex(5, 5).map_surrounding), 6)
+        values = self.grid.gather_neighbors(self.grid.altitude, wrap=False, fill=-1)
+        self.assertEqual((values[corner.index] >= 0).sum(), 2)
+
+        def map_surrounding(x, y):
+            # the rules of the original Hex.map_surrounding
+            last, even = self.size - 1, x % 2 == 0
+            found = set()
+            if y != last:
+                found.add((x, y + 1))
+            if y != 0:
+                found.add((x, y - 1))
+            if x != 0 and y != 0:
+                found.add((x - 1, y - 1) if even else (x - 1, y))
+            if x != 0 and y != last:
+                found.add((x - 1, y) if even else (x - 1, y + 1))
+            if x != last and y != 0:
+                found.add((x + 1, y - 1) if even else (x + 1, y))
+            if x != last and y != last:
+                found.add((x + 1, y) if even else (x + 1, y + 1))
+            return found
+
+        table = self.grid.map_neighbor_table
+        last = self.size - 1
+        for x in range(self.size):
+            for y in range(self.size):
+                if x in (0, 1, last - 1, last) or y in (0, last):
+                    row = table[x * self.size + y]
+                    found = set(divmod(int(index), self.size) for index in row[row >= 0])
+                    self.assertEqual(found, map_surrounding(x, y), "Hex {}, {}".format(x, y))
+
+    def test_distance_field(self):
+        sources = np.zeros((self.size, self.size), dtype=bool)
+        sources[10, 10] = True
+        distance = self.grid.distance_field(sources)
+        self.assertEqual(distance[10, 10], 0, "A source is 0 hexes from itself")
+        for h in self.grid.find_hex(10, 10).surrounding:
+            self.assertEqual(distance[h.x, h.y], 1, "Neighbors of a source are 1 hex away")
+        self.assertEqual(distance[10, 13], 3)
+        self.assertTrue((distance >= 0).all(), "Every hex can reach the source")
+        empty = self.grid.distance_field(np.zeros((self.size, self.size), dtype=bool))
+        self.assertTrue((empty == -1).all(), "No hex can reach a source that doesn't exist")
+
+    def test_label_components(self):
+        classes = np.full((self.size, self.size), -1)
+        classes[2:5, 2:5] = 1
+        classes[10:12, 10:12] = 1
+        classes[11, 12] = 2
+        labels, sizes = self.grid.label_components(classes)
+        self.assertEqual(list(sizes), [9, 4, 1], "Components should be numbered by their first hex")
+        self.assertTrue((labels[2:5, 2:5] == 0).all(), "A block of hexes should be one component")
+        self.assertNotEqual(labels[11, 11], labels[11, 12], "Hexes of another class are another component")
+        self.assertTrue((labels[classes < 0] == -1).all(), "Left out hexes should not be labeled")
+
+        # a strip along the west side joins the east side by wrapping
+        classes = np.full((self.size, self.size), -1)
+        classes[5, 0] = 0
+        classes[5, self.size - 1] = 0
+        labels, sizes = self.grid.label_components(classes)
+        self.assertEqual(list(sizes), [2])
+        labels, sizes = self.grid.label_components(classes, wrap=False)
+        self.assertEqual(list(sizes), [1, 1], "Components should not wrap about the map")
+
+    def test_grow_regions(self):
+        seeds = [self.grid.find_hex(5, 5).index, self.grid.find_hex(20, 20).index]
+        owner = self.grid.grow_regions(seeds)
+        self.assertTrue((owner >= 0).all(), "Regions should grow over the whole map")
+        self.assertEqual(owner[5, 5], 0)
+        self.assertEqual(owner[20, 20], 1)
+        self.assertEqual(owner[5, 6], 0, "Hexes should go to the nearest region")
+        distance = self.grid.distance_field(owner == 0)
+        self.assertTrue((distance[owner == 1] > 0).all())
+
+        first = self.grid.grow_regions(seeds, rng=np.random.default_rng(1), chance=0.5)
+        second = self.grid.grow_regions(seeds, rng=np.random.default_rng(1), chance=0.5)
+        self.assertTrue((first == second).all(), "Growth should be the same for the same seed")
+        self.assertTrue((first >= 0).all())
+        with self.assertRaises(ValueError):
+            self.grid.grow_regions(seeds, chance=0.5)
+        for chance in (0.0, -0.5, 1.5):
+            with self.assertRaises(ValueError):
+                self.grid.grow_regions(seeds, rng=np.random.default_rng(1), chance=chance)
+
+    def test_ball_sum(self):
+        values = np.random.default_rng(0).random((self.size, self.size))
+        for radius in (1, 3):
+            result = self.grid.ball_sum(values, radius)
+            for x, y in ((0, 0), (1, 7), (10, 29), (15, 15), (29, 3)):
+                sources = np.zeros((self.size, self.size), dtype=bool)
+                sources[x, y] = True
+                within = self.grid.distance_field(sources) <= radius
+                self.assertAlmostEqual(result[x, y], values[within].sum(),
+                                       msg="Ball sum is wrong at {}, {}".format(x, y))
+        counts = self.grid.ball_sum(np.ones((self.size, self.size), dtype=int), 3)
+        self.assertEqual(counts[15, 15], 37, "A hex has 37 hexes within 3 hexes of it")
+
+    def test_advect(self):
+        grid = self.columnar
+        values = np.zeros((self.size, self.size, 2))
+        values[5, 5] = 10
+        east = grid.find_hex(5, 6)
+        grid.wind_direction[5, 5] = HexEdge.east.id
+        grid.wind_target[5, 5] = east.index
+        result = grid.advect(values, iterations=1, rate=0.1)
+        self.assertAlmostEqual(result[5, 5, 0], 9, msg="The windward hex should take a share of the difference")
+        self.assertAlmostEqual(result[5, 6, 1], 1)
+        self.assertAlmostEqual(result.sum(), values.sum(), msg="Advection should not make or lose heat")
+        self.assertTrue((grid.advect(values, iterations=0) == values).all())
+
+    def test_temperature(self):
+        grid = self.columnar
+        h = grid.find_hex(8, 9)
+        self.assertEqual(h.temperature, (grid.temperature[8, 9, 0], grid.temperature[8, 9, 1]))
+        h.altitude = grid.sealevel
+        before = h.base_temperature[0]
+        h.altitude += 70
+        self.assertLess(h.base_temperature[0], before, "Raising a hex should cool it")
+        grid.wind_temp_effect[8, 9] = (1.5, -1.5)
+        grid.invalidate_temperature()
+        self.assertAlmostEqual(h.temperature[0] - h.base_temperature[0], 1.5)
+        self.assertAlmostEqual(h.temperature[1] - h.base_temperature[1], -1.5)
+
+    def test_rows(self):
+        grid = self.columnar
+        self.assertEqual(grid.latitude[0], 90)
+        self.assertEqual(grid.latitude[self.size // 2], 0)
+        self.assertEqual(grid.find_hex(3, 7).latitude, grid.latitude[3])
+        self.assertEqual(grid.find_hex(0, 0).zone, Zones.arctic_circle)
+        self.assertEqual(grid.find_hex(self.size // 2, 0).zone, Zones.southern_tropics)
+        self.assertEqual(grid.find_hex(self.size - 1, 0).zone, Zones.antarctic_circle)
+        self.assertEqual(grid.find_hex(self.size - 1, 0).hemisphere, Hemisphere.southern)
+        self.assertEqual(grid.latitude_ratio[0], 0)
+        self.assertEqual(grid.latitude_ratio[self.size // 2], 1)
+
+        # the zones follow the axial tilt
+        tilt = grid.params['axial_tilt']
+        self.assertEqual(grid.find_hex(2, 0).zone, Zones.arctic_circle)
+        grid.params['axial_tilt'] = 0
+        self.assertEqual(grid.find_hex(2, 0).zone, Zones.northern_temperate)
+        grid.params['axial_tilt'] = tilt
+
+    def test_resource(self):
+        h = self.columnar.find_hex(4, 6)
+        self.assertIsNone(h.resource)
+        h.resource = dict(rating=HexResourceRating.rich, type=HexResourceType.coal_deposit)
+        self.assertEqual(h.resource, dict(rating=HexResourceRating.rich, type=HexResourceType.coal_deposit))
+        self.assertEqual(self.columnar.resource_type[4, 6], HexResourceType.coal_deposit.id)
+        h.resource = None
+        self.assertIsNone(h.resource)
+        self.assertEqual(self.columnar.resource_rating[4, 6], 0)
@@ -19,3 +19,35 @@ class TestHeightmap(TestCase):
                          "Heightmap does not wrap horizontally")
         self.assertEqual(self.heightmap.grid[-1][1], self.heightmap.grid[-1][-2],
                          "Heightmap does not wrap vertically on the bottom")
+
+
+class TestIterativeHeightmap(TestCase):
+
+    def setUp(self):
+        self.params = dict(default_params)
+        self.size = 50
+        self.params['size'] = self.size
+        self.params['heightmap_engine'] = 'iterative'
+        self.params['random_seed'] = 1
+        self.heightmap = Heightmap(self.params)
+
+    def test_init(self):
+        self.assertEqual(self.heightmap.grid.shape, (self.size, self.size), "Grid size is incorrect")
+
+    def test_wrap(self):
+        self.assertEqual(self.heightmap.grid[1][0], self.heightmap.grid[1][-1],
+                         "Heightmap does not wrap horizontally")
+        self.assertEqual(self.heightmap.grid[-1][1], self.heightmap.grid[-1][-2],
+                         "Heightmap does not wrap vertically on the bottom")
+        self.assertEqual(self.heightmap.grid[0][1], self.heightmap.grid[0][-2],
+                         "Heightmap does not wrap vertically on the top")
+
+    def test_range(self):
+        low, high = self.params.get('height_range')
+        self.assertTrue(self.heightmap.grid.min() >= low and self.heightmap.grid.max() <= high,
+                        "Heightmap is outside of the height range")
+
+    def test_seed(self):
+        other = Heightmap(self.params)
+        self.assertTrue((self.heightmap.grid == other.grid).all(),
+                        "The same seed should build the same heightmap")
@@ -0,0 +1,61 @@
+from unittest import TestCase
+
+import numpy as np
+
+from hexgen.grid import Grid
+from hexgen.mapgen import default_params
+from hexgen.heightmap import Heightmap
+
+class TestNeighborhood(TestCase):
+
+    def setUp(self):
+        params = default_params
+        self.size = 20
+        params['size'] = self.size
+        self.grid = Grid(Heightmap(params), dict(params, grid_backend='columnar'))
+        self.neighborhood = self.grid.neighborhood
+
+    def walk(self, index, radius):
+        """ Hexes within radius of a hex the slow way """
+        found = {index}
+        for _ in range(radius):
+            found |= set(self.grid.neighbor_table[list(found)].ravel())
+        return found
+
+    def test_around(self):
+        for index in (0, 5, 3 * self.size + 7, 10 * self.size + 19, self.size * self.size - 1):
+            for radius in range(4):
+                around = self.neighborhood.around(index, radius)
+                self.assertEqual(len(around), len(set(around)), "Hexes should not repeat")
+                self.assertEqual(set(around), self.walk(index, radius))
+        self.assertEqual(len(self.neighborhood.around(10 * self.size, 3)), 37)
+
+    def test_around_many(self):
+        indexes = np.arange(self.size * self.size)
+        ball, valid = self.neighborhood.around_many(indexes, 2)
+        self.assertEqual(ball.shape, valid.shape)
+        for index in (0, 45, 399):
+            self.assertEqual(set(ball[index][valid[index]]), self.walk(index, 2))
+
+    def test_bubble(self):
+        h = self.grid.find_hex(10, 10)
+        self.assertEqual(set(h.bubble(1)), set(h.surrounding + [h]))
+        self.assertEqual(len(h.bubble(2)), 19)
+        self.assertEqual(h.bubble(0), [h])
+
+    def test_bounded(self):
+        for radius in range(1, 10):
+            self.neighborhood.around(0, radius)
+        self.assertLessEqual(len(self.neighborhood._kernels), self.neighborhood.max_kernels)
+
+    def test_edge_sum(self):
+        counts = np.zeros((self.size, self.size, 6), dtype=np.int64)
+        expected = np.zeros(self.size * self.size, dtype=np.int64)
+        # one edge in the middle counted twice, one next to the pole
+        for index, column, times in ((10 * self.size + 4, 0, 2), (self.size + 8, 3, 1)):
+            counts.reshape(-1, 6)[index, column] += times
+            other = self.grid.neighbor_table[index, column]
+            union = set(self.neighborhood.around(index, 3)) | set(self.neighborhood.around(other, 3))
+            expected[list(union)] += times
+        result = self.neighborhood.edge_sum(counts, 3)
+        self.assertTrue((result.ravel() == expected).all(), "Each edge should count once at every hex near it")
@@ -0,0 +1,50 @@
+from unittest import TestCase
+
+import numpy as np
+
+from hexgen.enums import HexSide
+from hexgen.grid import Grid
+from hexgen.mapgen import default_params
+from hexgen.heightmap import Heightmap
+from hexgen.river import river_tables, trace_river, trace_rivers, SIDES, SIDE_COLUMNS
+
+class TestRiver(TestCase):
+
+    def setUp(self):
+        params = default_params
+        self.size = 20
+        params['size'] = self.size
+        self.grid = Grid(Heightmap(params), dict(params, grid_backend='columnar'))
+        self.tables = river_tables(self.grid)
+
+    def test_tables(self):
+        for index in (0, 47, 210, 399):
+            h = self.grid.hex_at_index(index)
+            for side in HexSide:
+                edge = h.get_edge(side)
+                column = SIDE_COLUMNS[side]
+                self.assertEqual(self.tables['two'][index, column], edge.two.index)
+                self.assertEqual(self.tables['down'][index, column], edge.down.index)
+                forks = side.branching(edge.direction)
+                self.assertEqual([SIDES[c] for c in self.tables['branches'][index, column]], list(forks))
+
+    def test_trace(self):
+        land = np.flatnonzero(self.grid.land)
+        sources = [(int(i), int(i) % 6) for i in land[::7]]
+        rivers = trace_rivers(self.grid, sources)
+        self.assertEqual(len(rivers), len(sources))
+        keys = self.tables['keys']
+        for source, (edges, reached_sea) in zip(sources, rivers):
+            self.assertEqual(edges[0], source)
+            self.assertEqual(len(set(int(keys[e]) for e in edges)), len(edges), "A river should not reuse an edge")
+            if reached_sea:
+                index, column = edges[-1]
+                self.assertLess(self.grid.altitude.ravel()[self.tables['down'][index, column]], self.grid.sealevel)
+
+        # a second river from the same source is traced against the first river's edges
+        again = trace_rivers(self.grid, sources[:1] * 2)
+        claimed = set(int(keys[e]) for e in again[0][0])
+        edges, reached_sea, _ = trace_river(self.tables, self.grid.sealevel, sources[0], claimed)
+        self.assertEqual(again[1], (edges, reached_sea))
+        self.assertEqual(trace_rivers(self.grid, sources, workers=2), rivers,
+                         "Rivers should not depend on the number of workers")
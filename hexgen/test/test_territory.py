@@ -0,0 +1,36 @@
+from unittest import TestCase
+
+import numpy as np
+
+from hexgen.grid import Grid
+from hexgen.mapgen import default_params
+from hexgen.heightmap import Heightmap
+from hexgen.territory import Territory, find_groups
+
+class TestTerritory(TestCase):
+
+    def setUp(self):
+        params = default_params
+        self.size = 20
+        params['size'] = self.size
+        self.grid = Grid(Heightmap(params), dict(params, grid_backend='columnar'))
+        self.grid.altitude[:] = self.grid.sealevel
+
+        self.t1 = Territory(self.grid, self.grid.find_hex(2, 2), 0, (255, 0, 0))
+        self.t2 = Territory(self.grid, self.grid.find_hex(10, 10), 1, (0, 255, 0))
+        self.grid.territory_id[0:4, 0:4] = 0
+        self.grid.territory_id[10:13, 10:13] = 1
+        # a second block of the first territory, only joined to the first by wrapping
+        self.grid.territory_id[0:4, self.size - 2:] = 0
+
+    def test_find_groups(self):
+        labels, owners, sizes, centroids = find_groups(self.grid, [self.t1, self.t2])
+        self.assertEqual(list(owners), [0, 0, 1])
+        self.assertEqual(list(sizes), [16, 8, 9])
+        self.assertEqual(self.t2.groups, [dict(size=9, x=11, y=11)])
+        self.assertEqual(len(self.t1.groups), 2, "Groups should not wrap about the map")
+        self.assertEqual(self.t1.size, 24)
+
+        self.grid.altitude[1, 1] = 0
+        self.t1.find_groups()
+        self.assertEqual(sum(g['size'] for g in self.t1.groups), 23, "Water hexes are not in groups")
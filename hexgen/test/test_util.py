@@ -1,6 +1,11 @@
 from unittest import TestCase
 
-from hexgen.util import latitude_to_number
+import numpy as np
+
+from hexgen.grid import Grid
+from hexgen.heightmap import Heightmap
+from hexgen.mapgen import default_params
+from hexgen.util import latitude_to_number, pressure_at_seasons, wind_field, decide_wind
 
 class TestLatitudeToNumber(TestCase):
 
@@ -12,3 +17,33 @@ class TestLatitudeToNumber(TestCase):
     def test_tropics(self):
         self.assertEqual(latitude_to_number(45, 100), 25, "45°N is supposed to be the north tropics")
         self.assertEqual(latitude_to_number(-45, 100), 75, "45°S is supposed to be the south tropics")
+
+
+class TestPressureAtSeasons(TestCase):
+
+    def test_array(self):
+        latitude = np.linspace(-70, 70, 57)
+        rise = np.linspace(-6, 6, 57)
+        pressure = pressure_at_seasons(latitude, 1013.25, 4, rise, np.random.default_rng(0))
+        for lat, r, p in zip(latitude, rise, pressure):
+            self.assertLessEqual(abs(pressure_at_seasons(lat, 1013.25, 4, r) - p), 2)
+        self.assertEqual(pressure_at_seasons(0, 1013.25, 4, 0), 1009, "The ITCZ is lowest at the equator")
+
+
+class TestWindField(TestCase):
+
+    def setUp(self):
+        params = dict(default_params, size=20, grid_backend='columnar')
+        self.grid = Grid(Heightmap(params), params)
+        self.grid.pressure[:] = np.random.default_rng(0).integers(1008, 1018, (20, 20, 2))
+
+    def test_decide_wind(self):
+        direction, windward, pressure_diff = wind_field(self.grid, 1013.25)
+        for x, y in ((0, 0), (3, 17), (10, 10), (19, 5)):
+            h = self.grid.find_hex(x, y)
+            for season in range(2):
+                wind = decide_wind(season, 1013.25, h)
+                expected = wind.get('direction').id if wind.get('direction') else 0
+                self.assertEqual(direction[x, y, season], expected)
+                self.assertEqual(windward[x, y, season], wind.get('windward_hex').index)
+                self.assertAlmostEqual(pressure_diff[x, y, season], wind.get('pressure_diff'), places=4)
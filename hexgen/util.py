@@ -1,10 +1,11 @@
 import math
 import random
 import time
+import numpy as np
 
 from hexgen.enums import HexEdge, Hemisphere
 
-import collections
+import collections.abc
 import functools
 from itertools import combinations
 
@@ -17,7 +18,7 @@ class memoized(object):
         self.func = func
         self.cache = {}
     def __call__(self, *args):
-        if not isinstance(args, collections.Hashable):
+        if not isinstance(args, collections.abc.Hashable):
             # uncacheable. a list, for instance.
             # better to not cache than blow up.
             return self.func(*args)
@@ -34,6 +35,15 @@ class memoized(object):
         '''Support instance methods.'''
         return functools.partial(self.__call__, obj)
 
+# order of Hex.surrounding and Hex.neighbors
+SURROUNDING_EDGES = (HexEdge.east, HexEdge.south_east, HexEdge.south_west,
+                     HexEdge.west, HexEdge.north_west, HexEdge.north_east)
+SURROUNDING_COLUMNS = [direction.id - 1 for direction in SURROUNDING_EDGES]
+
+# order of Hex.map_surrounding
+MAP_SURROUNDING_EDGES = (HexEdge.east, HexEdge.west, HexEdge.north_west,
+                         HexEdge.north_east, HexEdge.south_west, HexEdge.south_east)
+
 def blend_colors(color1, color2):
     return min(round((color1[0] + color2[0]) / 2), 255), \
            min(round((color1[1] + color2[1]) / 2), 255), \
@@ -64,37 +74,50 @@ def latitude_to_number(latitude, map_size):
     return (map_size / 2) - ((latitude / 90) * (map_size / 2))
 
 
-def pressure_at_seasons(latitude, base_pressure, pressure_diff, itcz_rise):
+def pressure_at_seasons(latitude, base_pressure, pressure_diff, itcz_rise, rng=None):
     """
-    latitude = latitude in degrees
+    latitude = latitude in degrees, a number or an array
     base_pressure = the base surface atmospheric pressure at this planet in millibars
     pressure_diff = the max difference in pressure at each zone
-    itcz_rise = the rise in altitude of the ITCZ at this season at this latitude
+    itcz_rise = the rise in altitude of the ITCZ at this season at this latitude, a number or an array
+    rng = numpy Generator for the noise outside of the zones, otherwise random is used
+          and an array of latitudes gets the same noise everywhere
     """
-    itcz = (-10 + itcz_rise, 10 + itcz_rise)
-    sthz = dict(north=(20 + itcz_rise, 40 + itcz_rise),
-                south=(-40 + itcz_rise, -20 + itcz_rise))
-    pf = dict(north=(50 + itcz_rise, 70 + itcz_rise),
-              south=(-70 + itcz_rise, -50 + itcz_rise))
+    latitude = np.asarray(latitude, dtype=np.float64)
+    itcz_rise = np.asarray(itcz_rise, dtype=np.float64)
 
-    if itcz[0] <= latitude <= itcz[1]: # ITCZ
+    def within(low, high):
+        return (low + itcz_rise <= latitude) & (latitude <= high + itcz_rise)
+
+    zones = [
+        within(-10, 10), # ITCZ
+        within(-40, -20), # southern STHZ
+        within(20, 40), # northern STHZ
+        within(-70, -50), # southern PF
+        within(50, 70), # northern PF
+    ]
+    curves = [
         # highest around 0 degrees
-        final_pressure = base_pressure - (-math.pow(latitude - itcz_rise, 2) + 100) * (pressure_diff / 100)
-    elif sthz.get('south')[0] <= latitude <= sthz.get('south')[1]: # southern STHZ
+        base_pressure - (-np.square(latitude - itcz_rise) + 100) * (pressure_diff / 100),
         # highest around -30 degrees
-        final_pressure = base_pressure + ((-math.pow(latitude + (30 - itcz_rise), 2) + 100) / 100) * pressure_diff
-    elif sthz.get('north')[0] <= latitude <= sthz.get('north')[1]: # northern STHZ
+        base_pressure + ((-np.square(latitude + (30 - itcz_rise)) + 100) / 100) * pressure_diff,
         # highest around 30 degrees
-        final_pressure = base_pressure + ((-math.pow(latitude - (30 + itcz_rise), 2) + 100) / 100) * pressure_diff
-    elif pf.get('south')[0] <= latitude <= pf.get('south')[1]: # southern PF
+        base_pressure + ((-np.square(latitude - (30 + itcz_rise)) + 100) / 100) * pressure_diff,
         # highest around -60 degrees
-        final_pressure = base_pressure - ((-math.pow(latitude + (60 - itcz_rise), 2) + 100) / 100) * (pressure_diff / 2)
-    elif pf.get('north')[0] <= latitude <= pf.get('north')[1]: # northern PF
+        base_pressure - ((-np.square(latitude + (60 - itcz_rise)) + 100) / 100) * (pressure_diff / 2),
         # highest around 60 degrees
-        final_pressure = base_pressure - ((-math.pow(latitude - (60 + itcz_rise), 2) + 100) / 100) * (pressure_diff / 2)
+        base_pressure - ((-np.square(latitude - (60 + itcz_rise)) + 100) / 100) * (pressure_diff / 2),
+    ]
+    if rng is not None:
+        noise = rng.integers(-1, 2, size=np.broadcast(latitude, itcz_rise).shape)
+    elif not np.logical_or.reduce(zones).all():
+        noise = random.randint(-1, 1)
     else:
-        final_pressure = base_pressure + random.randint(-1, 1)
-    return round(final_pressure)
+        noise = 0
+    final_pressure = np.rint(np.select(zones, curves, base_pressure + noise))
+    if final_pressure.ndim == 0:
+        return int(final_pressure)
+    return final_pressure
 
 @memoized
 def clockwise_hex_edge(hex_edge, reverse=False):
@@ -123,10 +146,12 @@ def decide_wind(season_index, world_pressure, hexagon):
     world_pressure = the world's average surface air pressure
     hexagon = which hexagon we're making wind for
     """
-    lowest_neighbor = min(hexagon.neighbors, key=lambda h: h[1].pressure[season_index])
-    wind_direction = lowest_neighbor[0]
+    grid = hexagon.grid
+    around = grid.neighbor_table[hexagon.index, SURROUNDING_COLUMNS]
+    lowest = int(np.argmin(grid.pressure.reshape(-1, 2)[around, season_index]))
+    wind_direction = SURROUNDING_EDGES[lowest]
 
-    neighbor = hexagon.neighbor_at(wind_direction)
+    neighbor = grid.hex_at_index(around[lowest])
     if neighbor.pressure[season_index] == hexagon.pressure[season_index]:
         return {
             "direction": None,
@@ -145,7 +170,7 @@ def decide_wind(season_index, world_pressure, hexagon):
         else: # high pressure
             corrected_wind_direction = clockwise_hex_edge(wind_direction, True)
 
-    windward_hex = hexagon.neighbor_at(wind_direction)
+    windward_hex = neighbor
     pressure_diff = abs(hexagon.pressure[season_index] - windward_hex.pressure[season_index])
 
     return {
@@ -155,6 +180,40 @@ def decide_wind(season_index, world_pressure, hexagon):
     }
 
 
+# clockwise and anti-clockwise HexEdge ids, indexed by HexEdge id, 0 for no direction
+CLOCKWISE_EDGE_IDS = np.array([0] + [clockwise_hex_edge(HexEdge.get(i)).id for i in range(1, 7)], dtype=np.int8)
+ANTICLOCKWISE_EDGE_IDS = np.array([0] + [clockwise_hex_edge(HexEdge.get(i), True).id for i in range(1, 7)],
+                                  dtype=np.int8)
+SURROUNDING_EDGE_IDS = np.array([direction.id for direction in SURROUNDING_EDGES], dtype=np.int8)
+
+def wind_field(grid, world_pressure):
+    """
+    decide_wind for every hex and both seasons at once
+    grid = the Grid to make wind for, from its pressure
+    world_pressure = the world's average surface air pressure
+    returns (direction, windward, pressure_diff) arrays of shape (size, size, 2)
+    where direction is a HexEdge id (0 for no wind) and windward is the index of the windward hex
+    """
+    size = grid.size
+    pressure = grid.pressure.reshape(-1, 2)
+    around = grid.neighbor_table[:, SURROUNDING_COLUMNS]
+    lowest = np.argmin(pressure[around], axis=1)
+    windward = np.take_along_axis(around, lowest, axis=1)
+    windward_pressure = np.take_along_axis(pressure, windward, axis=0)
+    direction = SURROUNDING_EDGE_IDS[lowest]
+
+    # high pressure turns clockwise in the north, low pressure turns clockwise in the south
+    northern = np.repeat(grid.northern, size)[:, np.newaxis]
+    low = pressure <= world_pressure
+    direction = np.where(northern != low, CLOCKWISE_EDGE_IDS[direction], ANTICLOCKWISE_EDGE_IDS[direction])
+    pressure_diff = np.abs(pressure - windward_pressure)
+    direction[pressure_diff == 0] = 0
+
+    shape = (size, size, 2)
+    return direction.reshape(shape).astype(np.int8), windward.reshape(shape).astype(np.int32), \
+        pressure_diff.reshape(shape).astype(np.float32)
+
+
 class Timer:
     def __init__(self, text, debug=True):
         self.text = text
@@ -164,11 +223,11 @@ class Timer:
         if self.debug:
             print(self.text.ljust(50), end="")
             print('starting...')
-        self.start = time.clock()
+        self.start = time.perf_counter()
         return self
 
     def __exit__(self, *args):
-        self.end = time.clock()
+        self.end = time.perf_counter()
         self.interval = self.end - self.start
         if self.debug:
             print(self.text.ljust(50), end="")
@@ -233,11 +292,3 @@ def is_strait(h):
     if len(water_neighbors) == 2:
         return is_opposite_hex(water_neighbors[0][0], water_neighbors[1][0])
     return False
-
-def first_hex_without_geoform(hexes):
-    for y, row in enumerate(hexes):
-        for x, col in enumerate(row):
-            h = hexes[x][y]
-            if h.geoform_type is None:
-                return h
-    return None